@@ -1,15 +1,13 @@
-import os
-import threading
+import argparse
+import sys
 import traceback
 
-from csv import DictReader
-from tqdm import tqdm
-from PIL import Image
-from model import cards, sigils, costs, config, logging
-
-CARDS_FILE_PATH = config["cards_file_path"]
-SIGILS_FILE_PATH = config["sigils_file_path"]
-TRAITS_FILE_PATH = config["traits_file_path"]
+from model import cards, logging
+from model.exporter import CARDS_FILE_PATH, SIGILS_FILE_PATH, TRAITS_FILE_PATH, EXPORT_FUNCTIONS, export_rows, \
+    get_csv_data, load_registries
+from model.archives import get_archive_type
+from model.sheets import export_sheets
+from model.dependencies import DependencyIndex
 
 # ANSI color codes
 RESET = "\033[0m"
@@ -19,74 +17,73 @@ RED = "\033[31m"
 GREEN = "\033[32m"
 YELLOW = "\033[33m"
 
-successful_export = True
-
-
-def save_image(img, file_path):
-    try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        img.save(file_path)
-    except Exception as e:
-        logging.error(f"Failed to save image to {file_path}: {e}\n{traceback.format_exc()}")
-        print(f"{RED}Error: Failed to save image to {file_path}.{RESET}")
-
+CSV_FILE_PATHS = dict(cards=CARDS_FILE_PATH, sigils=SIGILS_FILE_PATH, traits=TRAITS_FILE_PATH)
+EXAMPLES = dict(
+    cards=("Bullfrog:Cat", "Adder,Bee:Squirrel,Bullfrog,Axolotl:Flying Ant,Wolf:Grizzly,Cat"),
+    sigils=("Green Gem:Prism Gem",
+            "Touch of Death,Armored:Scavenger,Green Gem,Bell Ringer:Strong Hand,Fecundity:Leader,Deathtrap"),
+    traits=("Nine Lives:Bone Power",
+            "Noble Stag Trait,Nine Lives:Bone Power,The Bloated Trait,Dice Power:traeH Power,"
+            "Skeleton Army Trait:Pipe Bomb Trait,WERE THE RATS"),
+)
+
+# Exit codes of the command line
+EXIT_SUCCESS = 0
+EXIT_EXPORT_FAILED = 1
+EXIT_ERROR = 3
+
+
+def select_rows(csv_file, data_list, arrays):
+    """
+    Returns the rows selected by the data list and arrays. Selected names and arrays are removed from them, so that
+    whatever is left once every row has been read was not found.
+    """
+    in_array = False
+    open_arrays = []
+    selected_rows = []
 
-def run_in_thread_pool(export_function, *args, **kwargs):
-    def target_func():
+    for row in csv_file:
         try:
-            export_function(*args, **kwargs)
+            item_name = row.get('Card Name', row.get('Name', '')).upper()
+            if item_name in arrays.values():
+                found = False
+                for open_array in open_arrays:
+                    found = arrays[open_array] == item_name
+                    if found:
+                        open_arrays.remove(open_array)
+                        arrays.pop(open_array)
+                        if len(open_arrays) == 0:
+                            in_array = False
+                        break
+                if not found:
+                    for key in arrays:
+                        if arrays[key] == item_name:
+                            arrays.pop(key)
+                            break
+                selected_rows.append(row)
+            elif in_array or type(data_list) is set or item_name in data_list:
+                if item_name in data_list:
+                    data_list.remove(item_name)
+                selected_rows.append(row)
+            elif item_name in arrays:
+                open_arrays.append(item_name)
+                in_array = True
+                selected_rows.append(row)
         except Exception as e:
-            logging.error(f"Error in thread while executing export function: {e}\n{traceback.format_exc()}")
-            print(f"{RED}Error: {e}{RESET}")
+            logging.error(f"Error selecting data for row {row}: {e}\n{traceback.format_exc()}")
+            print(f"{RED}Error selecting data for row {row}: {e}{RESET}")
+    return selected_rows
 
-    thread = threading.Thread(target=target_func)
-    thread.start()
-    return thread
 
+def parse_data_list(selection):
+    """Parses a selection such as 'Adder,Bee:Squirrel'. An empty selection returns an empty set, meaning everything."""
+    selection = selection.strip()
+    if selection == '':
+        return set()
+    return [obj.strip().upper() for obj in selection.split(",")]
 
-def export_data(csv_file, arrays, export_function):
-    global data_list
-    in_array = False
-    open_arrays = []
 
-    with tqdm(total=len(csv_file), desc=f"{BLUE}Exporting{RESET}", leave=True, bar_format="{l_bar}{bar}|",
-              colour="blue") as pbar:
-        for row in csv_file:
-            try:
-                item_name = row.get('Card Name', row.get('Name', '')).upper()
-                if item_name in arrays.values():
-                    found = False
-                    for open_array in open_arrays:
-                        found = arrays[open_array] == item_name
-                        if found:
-                            open_arrays.remove(open_array)
-                            arrays.pop(open_array)
-                            if len(open_arrays) == 0:
-                                in_array = False
-                            break
-                    if not found:
-                        for key in arrays:
-                            if arrays[key] == item_name:
-                                arrays.pop(key)
-                                break
-                    run_in_thread_pool(export_function, row)
-                elif in_array or type(data_list) is set or item_name in data_list:
-                    if item_name in data_list:
-                        data_list.remove(item_name)
-                    run_in_thread_pool(export_function, row)
-                elif item_name in arrays:
-                    open_arrays.append(item_name)
-                    in_array = True
-                    run_in_thread_pool(export_function, row)
-            except Exception as e:
-                logging.error(f"Error exporting data for row {row}: {e}\n{traceback.format_exc()}")
-                print(f"{RED}Error exporting data for row {row}: {e}{RESET}")
-
-            pbar.update(1)
-
-
-def get_data_list(example_1, example_2):
-    global data
+def get_data_list(data, example_1, example_2):
     while True:
         try:
             print(f"{YELLOW}Which {data} do you want to export?{RESET}")
@@ -98,18 +95,14 @@ def get_data_list(example_1, example_2):
 
             user_input = input(
                 f"{YELLOW}\nPlease list the {data} you wish to export (entering nothing will export all of them): {RESET}"
-            ).strip()
-
-            if user_input == '':
-                return set()
-            return [obj.strip().upper() for obj in user_input.split(",")]
+            )
+            return parse_data_list(user_input)
 
         except ValueError:
             print(f"{RED}Invalid input. Please try again.{RESET}")
 
 
-def extract_arrays():
-    global data_list
+def extract_arrays(data_list):
     arrays = {}
     for data_id in range(len(data_list) - 1, -1, -1):
         if ":" in data_list[data_id]:
@@ -118,27 +111,88 @@ def extract_arrays():
     return arrays
 
 
-def get_csv_data(file_path):
-    try:
-        with open(file_path, 'r', newline='', encoding='UTF-8') as f:
-            return list(DictReader(f, delimiter=','))
-    except Exception as e:
-        logging.error(f"Failed to read CSV file at {file_path}: {e}\n{traceback.format_exc()}")
-        print(f"{RED}Error: Failed to read CSV file at {file_path}.{RESET}")
-        return []
-
-
-def load_data(csv_data, action):
-    rows = csv_data
+def check_cards(rows):
+    """
+    Prints the layout every card would get without drawing them, and returns whether none of them overflows, misses
+    assets, uses unknown sigils or traits, or can't be read.
+    """
+    formats = {}
+    problems = 0
     for row in rows:
         try:
-            action(row)
+            report = cards.check_card(row)
         except Exception as e:
-            logging.error(f"Error loading data for row {row}: {e}\n{traceback.format_exc()}")
-            print(f"{RED}Error loading data for row {row}: {e}{RESET}")
+            logging.error(f"Error checking {row['Card Name']}: {e}\n{traceback.format_exc()}")
+            report = dict(format=None, overflow=False, empty_bottom=False, missing=[], unknown=[], errors=[str(e)])
+        notes = [report["format"] or "no sigils drawn"]
+        if report["empty_bottom"]:
+            notes.append("empty bottom")
+        if report["overflow"]:
+            notes.append("overflow")
+        notes += [f"missing {file}" for file in report["missing"]]
+        notes += [f"unknown {name}" for name in report["unknown"]]
+        notes += report["errors"]
+
+        has_problem = report["overflow"] or report["missing"] or report["unknown"] or report["errors"]
+        color = RED if has_problem else (RESET if report["format"] == "default" else YELLOW)
+        print(f"{color}{row['Card Name']}: {', '.join(notes)}{RESET}")
+        formats[report["format"]] = formats.get(report["format"], 0) + 1
+        problems += 1 if has_problem else 0
+
+    summary = ", ".join(f"{count} {card_format or 'without sigils'}" for card_format, count in formats.items())
+    print(f"\n{len(rows)} cards checked ({summary}), {problems} with problems.")
+    return problems == 0
+
+
+def report_not_found(not_found):
+    """Prints the selected items and --uses dependencies that weren't found, and returns whether they all were."""
+    if not_found:
+        print(f"{YELLOW}Not found: {', '.join(not_found)}{RESET}")
+    return not not_found
+
+
+def export_data(data, data_list, csv_path=None, output_dir="exports", workers=None, backend=None, incremental=False,
+                uses=None, list_only=False, check_only=False, archive=None, sheets=False, scale=1):
+    """
+    Exports the selected items, and returns whether every one of them was found and exported. Cards can be narrowed
+    down to the ones using the given dependencies, and the selection can be listed or checked instead of exported.
+    """
+    # Sigils and traits are exported from the registries, which need to know about the ones in the CSV file.
+    load_registries(data, csv_path)
+    csv_file = get_csv_data(csv_path or CSV_FILE_PATHS[data])
+    arrays = extract_arrays(data_list) if type(data_list) is list else {}
+    rows = select_rows(csv_file, data_list, arrays)
+    not_found = list(data_list) + [f"{start}:{end}" for start, end in arrays.items()]
+    if uses:
+        index = DependencyIndex(csv_file)
+        used_rows = set()
+        for dependency in uses:
+            users = index.get_rows_using(dependency)
+            if not users:
+                not_found.append(f"{dependency} (--uses)")
+            used_rows |= {id(row) for row in users}
+        rows = [row for row in rows if id(row) in used_rows]
+    if list_only:
+        for row in rows:
+            print(row.get('Card Name', row.get('Name', '')))
+        return report_not_found(not_found)
+    if check_only:
+        checked = check_cards(rows)
+        return report_not_found(not_found) and checked
+    if sheets:
+        failed = export_sheets(rows, workers=workers, output_dir=output_dir)
+    else:
+        failed = export_rows(data, rows, backend=backend, workers=workers, output_dir=output_dir,
+                             incremental=incremental, archive=archive, scale=scale, csv_path=csv_path)
 
+    if not report_not_found(not_found) or failed:
+        print(f"{YELLOW}\nWarning: Some {data} were not able to export.{RESET}")
+        return False
+    print(f"{GREEN}\nAll {data} were exported.{RESET}")
+    return True
 
-try:
+
+def run_interactive():
     export = None
     while export not in [1, 2, 3]:
         try:
@@ -147,117 +201,95 @@ try:
         except ValueError:
             pass
 
-    sigils_csv_data, traits_csv_data = None, None
-    if export in [1, 2]:
-        sigils_csv_data = get_csv_data(SIGILS_FILE_PATH)
-        load_data(sigils_csv_data, sigils.add_sigil)
-    if export in [1, 3]:
-        traits_csv_data = get_csv_data(TRAITS_FILE_PATH)
-        load_data(traits_csv_data, sigils.add_trait)
-
-    data = None
-    data_list = []
-
-    if export == 1:
-        data = "cards"
-        example = "Adder,Bee:Squirrel,Bullfrog,Axolotl:Flying Ant,Wolf:Grizzly,Cat"
-        data_list = get_data_list("Bullfrog:Cat", example)
-        total = len(data_list)
-        data_arrays = extract_arrays()
-
-
-        def export_card(row):
-            image, name = cards.create_card(row)
-            if config["export_sorted_by_folder"]:
-                save_image(image, f"exports/cards/{row['Temple']}/{row['Tier']}/{name}.png")
-            else:
-                save_image(image, "exports/cards/" + name + ".png")
-
-
-        export_data(get_csv_data(CARDS_FILE_PATH), data_arrays, export_card)
-    elif export == 2:
-        data = "sigils"
-        example = "Touch of Death,Armored:Scavenger,Green Gem,Bell Ringer:Strong Hand,Fecundity:Leader,Deathtrap"
-        data_list = get_data_list("Green Gem:Prism Gem", example)
-        total = len(data_list)
-        data_arrays = extract_arrays()
-
-        color = "black" if config["export_color"] == (0, 0, 0) else config["export_color"]
-        if config["export_sigil_patches"]:
-            patch = Image.open("assets/patch.png")
-
-
-        def export_sigil(row):
-            sigil = sigils.SIGILS[row['Name']]
-
-            if config["export_normal_formatting"]:
-                img = sigil.getImage(color=color)
-                save_image(img, "exports/sigils/" + sigil.name + ".png")
-
-            if config["export_shorter_formatting"]:
-                save_image(sigil.getImage(shortened_format=True, color=color),
-                           "exports/short sigils/" + sigil.name + ".png")
-
-            if config["export_base_game_formatting"]:
-                save_image(sigil.getImage(base_game=True, color=color),
-                           "exports/base game sigils/" + sigil.name + ".png")
-
-            if config["export_sigil_patches"]:
-                sigil_img = sigil.sigilImage(color=color)
-                sigil_patch = patch.copy()
-                sigil_box = tuple((sigil_patch.size[i] - sigil_img.size[i]) // 2 for i in range(2))
-                sigil_patch = cards.paste_sigil(sigil_patch, sigil_img, sigil_box)
-                save_image(sigil_patch, "exports/sigil patches/" + sigil.name + "_patch.png")
-
-            if config["export_sigil_description_icon"]:
-                icon = sigils.get_resized_image(sigil.sigilImage(color=color), config['sigil_description_icon_size'])
-                save_image(icon, "exports/sigil icons/" + sigil.name + "_icon.png")
-
-            if config["export_trait_description_icon"]:
-                icon = sigils.get_resized_image(sigil.sigilImage(color=color), config['trait_description_icon_size'])
-                save_image(icon, "exports/sigil icons/" + sigil.name + "_trait-icon.png")
-
-
-        export_data(sigils_csv_data, data_arrays, export_sigil)
-    else:
-        data = "traits"
-        example = "Noble Stag Trait,Nine Lives:Bone Power,The Bloated Trait,Dice Power:traeH Power,Skeleton Army Trait:Pipe Bomb Trait,WERE THE RATS"
-        data_list = get_data_list("Nine Lives:Bone Power", example)
-        total = len(data_list)
-        data_arrays = extract_arrays()
-
-        traitline = None
-        if config["exported_traitline"] != "None":
-            temple = config["exported_traitline"]
-            if temple in cards.TEMPLES:
-                traitlines = Image.open(f"assets/cardbacks/Traitlines.png").convert("RGBA")
-                traitline = costs.get_temple_variant(traitlines, temple)
-                traitline = traitline.resize((traitline.width * 10, traitline.height * 10), Image.NEAREST)
-            color = cards.TEXT_COLORS[temple]
+    data = ["cards", "sigils", "traits"][export - 1]
+    data_list = get_data_list(data, *EXAMPLES[data])
+    return export_data(data, data_list)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}.")
+    return number
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Exports cards, sigils or traits. Runs interactively when no arguments are given.")
+    parser.add_argument("type", choices=list(EXPORT_FUNCTIONS), help="What to export.")
+    parser.add_argument("-s", "--select", default="",
+                        help="Names to export, separated by commas. Two names separated by a colon export every item "
+                             "between them (e.g. 'Adder,Bee:Squirrel'). Exports everything if omitted.")
+    parser.add_argument("--csv", help="CSV file to read the exported items from. Defaults to the one in config.toml.")
+    parser.add_argument("-o", "--output", default="exports", help="Folder to export into. (Default: exports)")
+    parser.add_argument("-w", "--workers", type=positive_int, help="Number of export workers. Defaults to config.toml.")
+    parser.add_argument("-b", "--backend", choices=["threads", "processes"],
+                        help="Run exports on threads or processes. Defaults to config.toml.")
+    parser.add_argument("-u", "--uses", action="append",
+                        help="Only export the cards using this sigil, trait, token, cost type, conduit indicator or "
+                             "asset file (e.g. 'Sniper' or 'Airborne.png'). Can be given multiple times.")
+    parser.add_argument("-l", "--list", action="store_true", help="List the selected items instead of exporting them.")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                        help="Only export the cards whose data, assets or settings changed since their last export. "
+                             "Only for cards.")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="Report the sigil format, overflow, empty bottom use and missing assets of every selected "
+                             "card without exporting them. Only for cards.")
+    parser.add_argument("-a", "--archive",
+                        help="Write the exported images in this .zip, .tar, .tar.gz or .tgz file instead of the output "
+                             "folder, with the same folder layout.")
+    parser.add_argument("--sheets", action="store_true",
+                        help="Lay the cards out on sheets of cards for printing or Tabletop Simulator, as set in "
+                             "config.toml. Only for cards.")
+    parser.add_argument("-p", "--preview", type=float, metavar="SCALE",
+                        help="Export previews at this fraction of the full size, e.g. 0.25 for a quarter, in the "
+                             "previews folder of the output folder.")
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the exporter and returns the exit code : 0 when everything was exported, 1 when some items were not found or
+    failed to export (or failed the check), 3 when something else went wrong. Invalid arguments exit with code 2.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    try:
+        if not argv:
+            success = run_interactive()
         else:
-            color = "black" if config["export_color"] == (0, 0, 0) else config["export_color"]
-
-
-        def export_trait(row):
-            trait_img = sigils.TRAITS[row["Name"]].getImage(color=color)
-            if traitline:
-                box = (max(trait_img.width, traitline.width), traitline.height + 6 + trait_img.height)
-                final_img = Image.new("RGBA", box, (0, 0, 0, 0))
-                traitline_x = (final_img.width - traitline.width) // 2
-                final_img.paste(traitline, (traitline_x - traitline_x % 10, 0))
-                final_img.paste(trait_img, (0, traitline.height + 6))
-                save_image(final_img, "exports/traits/" + row["Name"] + ".png")
-            else:
-                save_image(trait_img, "exports/traits/" + row["Name"] + ".png")
-
-
-        export_data(traits_csv_data, data_arrays, export_trait)
-
-    if successful_export and total != total - len(data_arrays) - len(data_list):
-        print(f"{YELLOW}\nWarning: Some {data} were not able to export.{RESET}")
-    else:
-        print(f"{GREEN}\nAll {data} were exported.{RESET}")
-
-except Exception as error:
-    logging.error('An error occurred: %s', error)
-    print(f"{RED}Something went wrong. Check your error.log file for more information.{RESET}")
+            parser = get_argument_parser()
+            args = parser.parse_args(argv)
+            if args.check and args.type != "cards":
+                parser.error("--check can only be used with cards.")
+            if args.check and args.list:
+                parser.error("--check can't be used with --list.")
+            if args.uses and args.type != "cards":
+                parser.error("--uses can only be used with cards.")
+            if args.incremental and args.type != "cards":
+                parser.error("--incremental can only be used with cards.")
+            if args.sheets and (args.type != "cards" or args.incremental or args.archive):
+                parser.error("--sheets can only be used with cards, without --incremental or --archive.")
+            if args.preview is not None and not 0 < args.preview <= 1:
+                parser.error("--preview must be between 0 and 1.")
+            if args.preview is not None and (args.incremental or args.sheets):
+                parser.error("--preview can't be used with --incremental or --sheets.")
+            if args.archive and args.incremental:
+                parser.error("--incremental can't be used with --archive.")
+            if args.archive:
+                try:
+                    get_archive_type(args.archive)
+                except ValueError as e:
+                    parser.error(str(e))
+            success = export_data(args.type, parse_data_list(args.select), csv_path=args.csv, output_dir=args.output,
+                                  workers=args.workers, backend=args.backend, incremental=args.incremental,
+                                  uses=args.uses, list_only=args.list, check_only=args.check, archive=args.archive,
+                                  sheets=args.sheets, scale=args.preview or 1)
+        return EXIT_SUCCESS if success else EXIT_EXPORT_FAILED
+    except Exception as error:
+        logging.error(f"An error occurred: {error}\n{traceback.format_exc()}")
+        print(f"{RED}Something went wrong. Check your error.log file for more information.{RESET}")
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
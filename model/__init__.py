@@ -2,7 +2,8 @@ import toml
 import logging
 import os
 
-logging.basicConfig(filename='error.log', level=logging.ERROR,
+# The log file is only created once something is logged
+logging.basicConfig(handlers=[logging.FileHandler('error.log', delay=True)], level=logging.ERROR,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 if not os.path.exists('config.toml'):
@@ -0,0 +1,83 @@
+import io
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+from model import logging
+
+ARCHIVE_TYPES = dict(zip=".zip", tar=".tar", gztar=".tar.gz")
+
+
+def get_archive_type(path):
+    for archive_type, extension in sorted(ARCHIVE_TYPES.items(), key=lambda item: -len(item[1])):
+        if path.lower().endswith(extension):
+            return archive_type
+    if path.lower().endswith(".tgz"):
+        return "gztar"
+    raise ValueError(f"'{path}' is not a .zip, .tar, .tar.gz or .tgz archive.")
+
+
+class ArchiveWriter:
+    """
+    Streams files into a single ZIP or TAR archive from a dedicated writer thread, in the order they are queued.
+    ZIP entries are stored as they are unless compress is set, exported images being compressed already.
+    The queue is bounded, so that producers wait for the writer instead of piling encoded images up in memory.
+    """
+
+    def __init__(self, path: str, compress: bool = False, queue_size: int = 16):
+        self.path = path
+        self.archive_type = get_archive_type(path)
+        self.compress = compress
+        self.count = 0
+        self.error = None
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__names = set()
+        if self.archive_type == "zip":
+            self.__archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        else:
+            self.__archive = tarfile.open(path, "w|gz" if self.archive_type == "gztar" else "w|")
+        self.__thread = threading.Thread(target=self.__run, name="archive-writer", daemon=True)
+        self.__thread.start()
+
+    def write(self, name: str, data: bytes):
+        """Queues a file to be written in the archive under the given name, waiting if the queue is full."""
+        self.__queue.put((name.replace("\\", "/"), data))
+
+    def __add(self, name, data):
+        if name in self.__names:
+            logging.error(f"Duplicate file {name} in archive {self.path}, only the first one was kept.")
+            return
+        self.__names.add(name)
+        if self.archive_type == "zip":
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = self.__archive.compression
+            self.__archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self.__archive.addfile(info, io.BytesIO(data))
+        self.count += 1
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self.__add(*item)
+                except Exception as e:
+                    # Keep emptying the queue so that producers never wait forever on a dead writer
+                    logging.error(f"Failed to write {item[0]} in archive {self.path}: {e}")
+                    self.error = e
+
+    def close(self):
+        """Waits for every queued file to be written and finishes the archive. Raises the writer's error, if any."""
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__archive.close()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,137 @@
+import os
+
+from threading import Lock
+
+from PIL import Image
+from model import config
+from model.memorycache import MemoryCache
+
+TEMPLES = config["temples"]
+ASSET_CACHE_BUDGET = config['asset_cache_budget'] * 1024 * 1024
+ASSETS_FOLDER = "assets"
+FILE_NAME_TRANSLATION = str.maketrans("", "", " ',-!?")
+
+
+def get_file_name(name):
+    """Returns the name of the asset files of a card, sigil or conduit : its name without spaces and ',-!? characters."""
+    return name.translate(FILE_NAME_TRANSLATION)
+
+
+def get_temple_variant(image, temple):
+    if temple not in TEMPLES:
+        raise ValueError(f"'{temple}' is not a valid temple.")
+    width, height = image.size
+    version_height = height // len(TEMPLES)
+    version_index = TEMPLES.index(temple)
+    top = version_index * version_height
+    bottom = (version_index + 1) * version_height
+    return image.crop((0, top, width, bottom))
+
+
+def get_image_size(image):
+    return image.width * image.height * len(image.getbands())
+
+
+class AssetCache(MemoryCache):
+    """
+    Thread-safe cache of decoded RGBA assets, evicting the least recently used images once the total size of the
+    cached pixel data goes over the byte budget.
+    Images handed out by the cache are shared between every caller : they must be copied before being modified.
+    """
+
+    def __init__(self, byte_budget: int):
+        super().__init__(byte_budget, get_image_size)
+
+    def get(self, key, load_image) -> Image.Image:
+        """Returns the image cached under the given key, calling load_image to produce it if it isn't cached."""
+        def load():
+            image = load_image()
+            image.load()
+            return image
+
+        return super().get(key, load)
+
+    def get_image(self, path: str, temple: str = None) -> Image.Image:
+        """Returns the decoded RGBA image at the given path, cropped to the temple's variant if a temple is given."""
+        if temple is not None:
+            return self.get((path, temple), lambda: get_temple_variant(self.get_image(path), temple))
+        return self.get((path, None), lambda: Image.open(path).convert("RGBA"))
+
+
+ASSETS = AssetCache(ASSET_CACHE_BUDGET)
+
+
+def get_image(path: str, temple: str = None) -> Image.Image:
+    return ASSETS.get_image(path, temple)
+
+
+def get_upscaled_image(path: str, temple: str = None, factor: int = 10) -> Image.Image:
+    """Returns the (temple variant of the) asset upscaled with nearest neighbour, building it only once."""
+    def upscale():
+        image = get_image(path, temple)
+        return image.resize((image.width * factor, image.height * factor), Image.NEAREST)
+
+    return ASSETS.get((path, temple, factor), upscale)
+
+
+class AssetManifest:
+    """
+    Index of every file in the assets folder, scanned once on first use, so that checking whether an asset exists
+    doesn't touch the disk. Paths are given the way they are loaded, e.g. 'assets/sigils/Airborne.png'.
+    Paths that aren't in the index are checked on disk once, so that they are found the same way the images are
+    opened on case-insensitive file systems (e.g. 'RedHart.png' for 'Redhart.png' on Windows).
+    """
+
+    def __init__(self, folder: str = ASSETS_FOLDER):
+        self.folder = folder
+        self.__files = None
+        self.__indexed = None
+        self.__found_on_disk = {}
+        self.__lock = Lock()
+
+    @property
+    def files(self) -> set:
+        if self.__files is None:
+            with self.__lock:
+                if self.__files is None:
+                    files = set()
+                    for root, _, file_names in os.walk(self.folder):
+                        for file_name in file_names:
+                            files.add(os.path.join(root, file_name).replace(os.sep, "/"))
+                    self.__indexed = {os.path.normcase(path) for path in files}
+                    self.__files = files
+        return self.__files
+
+    def exists(self, path: str) -> bool:
+        if path in self.files or os.path.normcase(path) in self.__indexed:
+            return True
+        found = self.__found_on_disk.get(path)
+        if found is None:
+            found = self.__found_on_disk[path] = os.path.exists(path)
+        return found
+
+    def get_card_art_path(self, name: str):
+        """
+        Returns the path of the card's art, and whether it is upscaled along with the card, the alternate art of '_alt'
+        cards being pasted as it is. Returns None for the path if there is no art.
+        """
+        image_file = get_file_name(name)
+        if "_alt" in name:
+            for path in [f"{self.folder}/card_art/{image_file}-alt.png", f"{self.folder}/card_art/{image_file}.png"]:
+                if self.exists(path):
+                    return path, False
+        path = f"{self.folder}/card_art/{image_file}.png"
+        return (path if self.exists(path) else None), True
+
+    def get_sigil_path(self, name: str, outline: bool = False):
+        """Returns the path of the sigil's image, using its outline variant if asked for and there is one."""
+        path = f"{self.folder}/sigils/{get_file_name(name)}.png"
+        outline_path = f"{self.folder}/sigils/{get_file_name(name)}_outline.png"
+        return outline_path if outline and self.exists(outline_path) else path
+
+    def get_missing(self, paths) -> list:
+        return sorted(path for path in set(paths) if not self.exists(path))
+
+
+MANIFEST = AssetManifest()
+
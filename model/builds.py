@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+
+from model import sigils, config, logging
+from model.dependencies import get_card_dependencies
+from model.fonts import FONT
+
+MANIFEST_FILE_NAME = ".build_manifest.json"
+PIXEL_INDEX_FILE_NAME = ".pixel_hashes.json"
+# Settings that change what gets exported or how fast, but never what a card looks like.
+NON_RENDERING_KEYS = ["cards_file_path", "sigils_file_path", "traits_file_path", "exported_traitline",
+                      "recolor_cache_size", "asset_cache_budget", "export_workers", "export_queue_size",
+                      "export_backend", "export_shard_size", "render_cache_folder", "render_cache_size",
+                      "render_memo_size", "text_cache_size",
+                      "native_resolution_compositing"]
+
+
+def get_rendering_config():
+    return {key: value for key, value in config.items()
+            if key not in NON_RENDERING_KEYS and not (key.startswith("export_") and key != "export_sorted_by_folder")}
+
+
+def get_output_key(output_dir, output_path):
+    return os.path.relpath(output_path, output_dir).replace(os.sep, "/")
+
+
+def read_json_index(path, description):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='UTF-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to read {description} at {path}: {e}")
+        return {}
+
+
+def get_sigil_definition(name, registry):
+    sigil = registry.get(name)
+    if sigil is None:
+        return None
+    return [sigil.name, sigil.description, sigil.is_attack_sigil, sigil.can_be_colored]
+
+
+class BuildManifest:
+    """
+    Remembers the fingerprint of every card exported to a folder, so that only the cards whose inputs changed since
+    their last export need to be rendered again.
+    A card's fingerprint covers its CSV row, the sigils and traits it uses, every asset file it may read, the font,
+    the rendering settings of config.toml and the renderer's own code.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+        self.fingerprints = read_json_index(self.path, "build manifest")
+        self.__file_hashes = {}
+        self.__lock = threading.Lock()
+        self.__shared_fingerprint = self.__hash_json([
+            get_rendering_config(),
+            [self.get_file_hash(file) for file in [FONT] + sigils.get_renderer_sources()],
+        ])
+
+    def __get_key(self, output_path):
+        return get_output_key(self.output_dir, output_path)
+
+    @staticmethod
+    def __hash_json(data):
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_file_hash(self, path):
+        """Returns the hash of the file's content, or None if it doesn't exist. Files are only read once."""
+        if path not in self.__file_hashes:
+            try:
+                with open(path, 'rb') as f:
+                    self.__file_hashes[path] = hashlib.sha256(f.read()).hexdigest()
+            except FileNotFoundError:
+                self.__file_hashes[path] = None
+        return self.__file_hashes[path]
+
+    def get_card_fingerprint(self, csv_dict):
+        dependencies = get_card_dependencies(csv_dict)
+        if dependencies is None:
+            return None
+        return self.__hash_json([
+            self.__shared_fingerprint,
+            csv_dict,
+            [get_sigil_definition(name, sigils.SIGILS) for name in dependencies["sigils"]],
+            [get_sigil_definition(name, sigils.TRAITS) for name in dependencies["traits"]],
+            {file: self.get_file_hash(file) for file in dependencies["files"]},
+        ])
+
+    def get_outdated(self, rows, get_output_path):
+        """Returns the (row, fingerprint) pairs of the rows whose output is missing or was built from other inputs."""
+        outdated = []
+        for row in rows:
+            output_path = get_output_path(row)
+            fingerprint = self.get_card_fingerprint(row)
+            if fingerprint is None or self.fingerprints.get(self.__get_key(output_path)) != fingerprint \
+                    or not os.path.exists(output_path):
+                outdated.append((row, fingerprint))
+        return outdated
+
+    def record(self, output_path, fingerprint):
+        with self.__lock:
+            if fingerprint is None:
+                self.fingerprints.pop(self.__get_key(output_path), None)
+            else:
+                self.fingerprints[self.__get_key(output_path)] = fingerprint
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.__lock, open(self.path, 'w', encoding='UTF-8') as f:
+            json.dump(self.fingerprints, f, indent=0, sort_keys=True)
+
+
+class PixelIndex:
+    """
+    Remembers the pixel hash and file size of every image exported to a folder, so that images rendering to the same
+    pixels as the file already there are neither encoded nor written again.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, PIXEL_INDEX_FILE_NAME)
+        self.entries = read_json_index(self.path, "pixel index")
+        self.__lock = threading.Lock()
+
+    def get_paths(self):
+        """Returns the entries by output path, as the exporter names the files, to be looked up by the workers."""
+        return {os.path.normpath(os.path.join(self.output_dir, key)): tuple(entry)
+                for key, entry in self.entries.items()}
+
+    def record(self, output_path, pixel_hash, size):
+        with self.__lock:
+            self.entries[get_output_key(self.output_dir, output_path)] = [pixel_hash, size]
+
+    def save(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self.__lock, open(self.path, 'w', encoding='UTF-8') as f:
+            json.dump(self.entries, f, indent=0, sort_keys=True)
@@ -1,10 +1,11 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from model import config, logging, sigils, costs
+from model.assets import MANIFEST, get_file_name, get_image, get_upscaled_image
+from model.fonts import get_font, get_text_length, write_text
 from unidecode import unidecode
 
 TEMPLES = config['temples']
 TEXT_COLORS = config['text_colors']
-FONT = "data/fonts/" + config['font'] + ".ttf"
 
 
 def get_bottom_outline_y(tier, temple, bloodless):
@@ -22,55 +23,99 @@ def get_bottom_outline_y(tier, temple, bloodless):
         logging.error(f"Error: Tier not recognized : {tier}")
 
 
+def get_card_variant(csv_dict):
+    """
+    Returns what decides which files a card is drawn from : its tier and the tier of its cardback files, its temple,
+    whether it is bloodless and the matching cardback suffix, its cost (None when free), its tribes and the conduit
+    indicator its tribes call for.
+    """
+    bloodless = ('Bloodless' in csv_dict['Sigils'] or 'Bloodless' in csv_dict['Traits']) and config['bloodless_outline']
+    tier = csv_dict['Tier']
+    tribes = csv_dict['Tribes'].split(' ') if csv_dict['Tribes'] not in ['None', ''] else []
+    return dict(
+        tier=tier,
+        file_tier=tier if tier != "Side Deck" else "Common",
+        temple=csv_dict['Temple'],
+        bloodless=bloodless,
+        sac="Terrain" if bloodless else "",
+        cost=csv_dict['Cost'] if csv_dict['Cost'].upper() not in ['NONE', '', 'FREE'] else None,
+        tribes=tribes,
+        conduit="NullConduit" if "Conduit" in tribes and config["conduit_tribe_overlay"] else None,
+    )
+
+
+def get_cardback_path(file_tier, sac):
+    return f"assets/cardbacks/{file_tier}{sac}Cardback.png"
+
+
+def get_bottom_path(tier, file_tier, sac, temple):
+    """Returns the empty bottom overlay of the card, which is already cropped to the temple for rare cards."""
+    if tier != "Rare":
+        return f"assets/cardbacks/{file_tier}{sac}Cardback_bt.png"
+    return f"assets/cardbacks/{file_tier}{temple}{sac}Cardback_bt.png"
+
+
+def get_card_template(file_tier, sac, temple):
+    """Returns a new upscaled blank card, copied from the template built for this tier, terrain and temple."""
+    return get_upscaled_image(get_cardback_path(file_tier, sac), temple).copy()
+
+
+def get_bottom_template(tier, file_tier, sac, temple):
+    """Returns the shared upscaled empty bottom overlay for this tier, terrain and temple."""
+    return get_upscaled_image(get_bottom_path(tier, file_tier, sac, temple), temple if tier != "Rare" else None)
+
+
+def get_patch_path(sigil_height, is_latcher):
+    """Returns the latch or cell image fitting a sigil of the given height."""
+    patch = "LATCH" if is_latcher else "CELL"
+    if sigil_height < 150:
+        return f"assets/cardbacks/{patch}.png"
+    elif sigil_height < 190:
+        return f"assets/cardbacks/{patch}3.png"
+    return f"assets/cardbacks/{patch}4.png"
+
+
 def get_latch_image(sigil_img, temple):
-    if sigil_img.height < 150:
-        patch_image = costs.get_temple_variant(Image.open("assets/cardbacks/LATCH.png"), temple)
-    elif sigil_img.height < 190:
-        patch_image = costs.get_temple_variant(Image.open("assets/cardbacks/LATCH3.png"), temple)
-    else:
-        patch_image = costs.get_temple_variant(Image.open("assets/cardbacks/LATCH4.png"), temple)
+    patch_image = get_image(get_patch_path(sigil_img.height, True), temple).copy()
     patch_image.paste(sigil_img, (100, (patch_image.height - sigil_img.height) // 2 + 2), sigil_img)
     return patch_image
 
 
 def get_cell_image(sigil_img, temple):
-    if sigil_img.height < 150:
-        patch_image = costs.get_temple_variant(Image.open("assets/cardbacks/CELL.png"), temple)
-    elif sigil_img.height < 190:
-        patch_image = costs.get_temple_variant(Image.open("assets/cardbacks/CELL3.png"), temple)
-    else:
-        patch_image = costs.get_temple_variant(Image.open("assets/cardbacks/CELL4.png"), temple)
+    patch_image = get_image(get_patch_path(sigil_img.height, False), temple).copy()
     patch_image.paste(sigil_img, (120, (patch_image.height - sigil_img.height) // 2 + 3), sigil_img)
     return patch_image
 
-def format_evaluation(sigil_list, trait_list, sigil_y, image, tier, temple, bloodless, default_format: bool = True):
+
+def format_evaluation(sigil_list, trait_list, sigil_y, card_height, tier, temple, bloodless,
+                      default_format: bool = True):
+    """Evaluates a format from the measured heights of the sigils and traits, without rendering any of them."""
     can_draw_sigils = True
     # Add the combined height of all the sigils.
     for sigil in sigil_list:
         if sigil == "RAINBOW":
-            if sigil_y + 70 > image.height:
+            if sigil_y + 70 > card_height:
                 can_draw_sigils = False
             sigil_y += 75 + (10 - sigil_y % 10)
         else:
-            sigil_img = sigil.getImage() if default_format else sigil.getImage(shortened_format=True)
+            sigil_height = sigil.getHeight(shortened_format=not default_format)
             if sigil.is_latcher or sigil.is_cell:
-                sigil_img = get_latch_image(sigil_img, temple) if sigil.is_latcher else get_cell_image(sigil_img, temple)
+                sigil_height = get_image(get_patch_path(sigil_height, sigil.is_latcher), temple).height
                 sigil_y += 10 - sigil_y % 10
             # If the sigil height overflows the card, we can't draw the sigils.
-            if sigil_y + sigil_img.height > image.height:
+            if sigil_y + sigil_height > card_height:
                 can_draw_sigils = False
-            sigil_y += sigil_img.height + 5
+            sigil_y += sigil_height + 5
     trait_height = 0
     if len(trait_list) > 0:
-        traitlines = Image.open(f"assets/cardbacks/Traitlines.png")
-        traitline = costs.get_temple_variant(traitlines, temple)
+        traitline = get_image("assets/cardbacks/Traitlines.png", temple)
         trait_height = traitline.height * 10 + 6
     for trait in trait_list:
-        trait_img = trait.getImage(color=TEXT_COLORS[temple])
+        trait_img_height = trait.getHeight(color=TEXT_COLORS[temple])
         # If the trait height overflows the card, we can't draw the sigils.
-        if sigil_y + trait_height + trait_img.height > image.height:
+        if sigil_y + trait_height + trait_img_height > card_height:
             can_draw_sigils = False
-        trait_height += trait_img.height
+        trait_height += trait_img_height
     sigil_y += trait_height
     # If the sigil height does not overflow the card, but is on top of the bottom border of the image,
     # then we need to use the empty bottom for this card.
@@ -78,37 +123,90 @@ def format_evaluation(sigil_list, trait_list, sigil_y, image, tier, temple, bloo
     return can_draw_sigils, use_empty_bottom, trait_height
 
 
+def plan_sigil_layout(sigil_list, trait_list, sigil_y, card_height, tier, temple, bloodless):
+    """
+    Chooses how the sigils will be drawn on the card, only from their measured heights.
+    Returns the chosen format ("default", "short", "base game" or None if none is allowed), whether the empty bottom is
+    used, the height of the traits, and whether the sigils overflow the card.
+    """
+    for default_format, allowed in [(True, config["allow_default_formatting"]),
+                                    (False, config["allow_shorter_formatting"])]:
+        if not allowed:
+            continue
+        fits, use_empty_bottom, trait_height = format_evaluation(
+            sigil_list, trait_list, sigil_y, card_height, tier, temple, bloodless, default_format
+        )
+        can_draw_sigils = fits
+        if use_empty_bottom:
+            if not config["allow_card_bottom_removal"]:
+                can_draw_sigils = False
+            elif not config["prioritize_removing_bottom"] and default_format:
+                can_draw_sigils = False
+        if can_draw_sigils or not (default_format or config["allow_base_game_display"]):
+            return dict(format="default" if default_format else "short", use_empty_bottom=use_empty_bottom,
+                        trait_height=trait_height, overflow=not fits)
+    return dict(format="base game" if config["allow_base_game_display"] else None, use_empty_bottom=False,
+                trait_height=0, overflow=False)
+
+
+def get_card_art(name):
+    """
+    Returns the card's art at its native resolution, and whether it is upscaled along with the card.
+    Alternate art is pasted as it is.
+    """
+    path, upscale = MANIFEST.get_card_art_path(name)
+    if path is None:
+        # Loading the missing file raises the FileNotFoundError
+        path = f"assets/card_art/{get_file_name(name)}.png"
+        if "_alt" in name:
+            print(f"Error: {path} file not found.")
+            logging.error(f"Error: {path} file not found.")
+    return get_image(path), upscale
+
+
+def paste_costs(image, cost, temple):
+    cost_y = config['cost_bottom']
+    for cost_img in costs.get_cost_images(cost, temple):
+        cost_y -= cost_img.height + 10
+        image.paste(cost_img, (config['cost_right_border'] - cost_img.width, cost_y), cost_img)
+
+
 def paste_card_art(name, image, cost, temple):
     # Fetch card art and paste it
-    card_art = None
-    image_file = name.translate(str.maketrans("", "", " ',-!?"))
-    if "_alt" in name:
-        try:
-            card_art = Image.open(f"assets/card_art/{image_file}-alt.png").convert("RGBA")
-        except FileNotFoundError:
-            try:
-                card_art = Image.open(f"assets/card_art/{image_file}.png").convert("RGBA")
-            except FileNotFoundError:
-                print(f"Error: assets/card_art/{image_file}.png file not found.")
-                logging.error(f"Error: assets/card_art/{image_file}.png file not found.")
-    if not card_art:
-        card_art = Image.open(f"assets/card_art/{image_file}.png").convert("RGBA")
+    card_art, upscale = get_card_art(name)
+    if upscale:
         card_art = card_art.resize((card_art.width * 10, card_art.height * 10), Image.NEAREST)
     image.paste(card_art, mask=card_art)
 
     # Generate and paste cost
-    cost_y = config['cost_bottom']
-    for cost in cost:
-        cost_img = cost.getCostImage(temple)
-        cost_y -= cost_img.height + 10
-        image.paste(cost_img, (config['cost_right_border'] - cost_img.width, cost_y), cost_img)
+    paste_costs(image, cost, temple)
+
+
+def get_native_card(name, file_tier, sac, temple):
+    """
+    Returns a new card with its art, pasting the art on the blank card at their native resolution and upscaling the
+    result once. Pasting commutes with nearest neighbour upscaling, so the card is the same as when pasting at 10x.
+    """
+    image = get_image(get_cardback_path(file_tier, sac), temple).copy()
+    card_art, upscale = get_card_art(name)
+    if upscale:
+        image.paste(card_art, mask=card_art)
+    image = image.resize((image.width * 10, image.height * 10), Image.NEAREST)
+    if not upscale:
+        image.paste(card_art, mask=card_art)
+    return image
 
 
 def paste_sigil(image, sigil_img, box):
-    sigil_img_trans = Image.new("RGBA", image.size)
-    sigil_img_trans.paste(sigil_img, box, mask=sigil_img)
-    new_img = Image.alpha_composite(image, sigil_img_trans)
-    return new_img
+    """Composites the sigil over the image at the box, in place, only blending the area the sigil covers."""
+    left, top = max(box[0], 0), max(box[1], 0)
+    right, bottom = min(box[0] + sigil_img.width, image.width), min(box[1] + sigil_img.height, image.height)
+    if left >= right or top >= bottom:
+        return image
+    sigil_img_trans = Image.new("RGBA", sigil_img.size)
+    sigil_img_trans.paste(sigil_img, (0, 0), mask=sigil_img)
+    image.alpha_composite(sigil_img_trans, (left, top), (left - box[0], top - box[1], right - box[0], bottom - box[1]))
+    return image
 
 
 def get_sigil_and_trait_list(csv_dict, conduit):
@@ -150,7 +248,7 @@ def get_sigil_and_trait_list(csv_dict, conduit):
                 # Determine if a conduit indicator will need to be on the card because of a Conduit sigil.
                 if "Conduit" in sigil:
                     if not (conduit and sigil == "Null Conduit"):
-                        conduit = sigil.translate(str.maketrans("", "", " ',-!?"))
+                        conduit = get_file_name(sigil)
 
         for sigil in str_traits:
             is_latcher, is_cell = False, False
@@ -164,32 +262,45 @@ def get_sigil_and_trait_list(csv_dict, conduit):
         logging.error(f"Error: {e}")
 
 
+def get_name_size(written_name):
+    """Returns the largest font size, up to the configured one, at which the name fits in the maximum name width."""
+    def fits(size):
+        return get_text_length(written_name, get_font(size)) <= config['max_name_width']
+
+    if fits(config['name']):
+        return config['name']
+    low, high = 1, config['name'] - 1
+    while low < high:
+        size = (low + high + 1) // 2
+        if fits(size):
+            low = size
+        else:
+            high = size - 1
+    return low
+
+
 def write_name(image, draw, name):
     written_name = unidecode(name).replace("_alt", "")
-    name_size = config['name']
-    name_y = config['card_name_top_height']
-    heavyweight_font = ImageFont.truetype(FONT, name_size)
-    while draw.textlength(written_name, font=heavyweight_font) > config['max_name_width']:
-        name_size -= 1
-        heavyweight_font = ImageFont.truetype(FONT, name_size)
-        name_y += 0.5
+    name_size = get_name_size(written_name)
+    heavyweight_font = get_font(name_size)
+    # Smaller names are lowered by half a pixel per size, to stay centered on the name line
+    name_y = config['card_name_top_height'] + (config['name'] - name_size) * 0.5
     if config["center_card_name"]:
-        name_x = (image.width - draw.textlength(written_name, font=heavyweight_font)) // 2
+        name_x = (image.width - get_text_length(written_name, heavyweight_font)) // 2
     else:
         name_x = config["card_name_left_border"]
-    draw.text((name_x, int(name_y)), written_name, fill="black", font=heavyweight_font)
+    write_text(draw, (name_x, int(name_y)), written_name, "black", heavyweight_font)
 
 
 def write_flavor_text(draw, font, flavor_text, temple):
     flavor_text: str = flavor_text.replace("\r", "").replace("\n", " ").replace('"', "''")
     if flavor_text != "BLANK":
-        while draw.textlength(flavor_text, font=font) > config['max_flavor_text_width']:
+        while get_text_length(flavor_text, font) > config['max_flavor_text_width']:
             limit = flavor_text.rfind(" ") if " " in flavor_text else -6
             flavor_text = flavor_text[:limit] + "..."
             flavor_text += "''" if "''" in flavor_text else ""
-        flavor_text_x = 300 + (700 - draw.textlength(flavor_text, font=font)) // 2
-        draw.text((flavor_text_x, config['flavor_text_top_height']), flavor_text, fill=TEXT_COLORS[temple],
-                  font=font)
+        flavor_text_x = 300 + (700 - get_text_length(flavor_text, font)) // 2
+        write_text(draw, (flavor_text_x, config['flavor_text_top_height']), flavor_text, TEXT_COLORS[temple], font)
 
 
 def write_card_description(image, draw, font, temple, tier, tribes):
@@ -200,13 +311,13 @@ def write_card_description(image, draw, font, temple, tier, tribes):
             description += tribe + " "
         description = description[:-1]
     desc_y = config['description_top_height']
-    desc_x = (image.width - draw.textlength(description, font=font)) // 2
-    draw.text((desc_x, desc_y), description, fill=TEXT_COLORS[temple], font=font)
+    desc_x = (image.width - get_text_length(description, font)) // 2
+    write_text(draw, (desc_x, desc_y), description, TEXT_COLORS[temple], font)
 
 
 def draw_text(image, name, tier, temple, tribes, flavor_text):
     draw = ImageDraw.Draw(image)
-    heavyweight_font = ImageFont.truetype(FONT, config['flavor_text'])
+    heavyweight_font = get_font(config['flavor_text'])
 
     # Write card name
     write_name(image, draw, name)
@@ -225,90 +336,68 @@ def draw_conduit_indicator(image, conduit_img):
     return image
 
 
-def draw_sigils(image, temple, tier, file_tier, sac, bloodless,
-                conduit, conduit_img, sigil_y, sigil_list, trait_list, default_format):
-    can_draw_sigils, use_empty_bottom, trait_height = format_evaluation(
-        sigil_list, trait_list, sigil_y, image, tier, temple, bloodless, default_format
-    )
-
+def draw_sigils(image, temple, tier, file_tier, sac, bloodless, conduit, conduit_img, sigil_y, sigil_list, trait_list,
+                default_format, use_empty_bottom, trait_height):
     if use_empty_bottom:
-        if not config["allow_card_bottom_removal"]:
-            can_draw_sigils = False
-        elif not config["prioritize_removing_bottom"] and default_format:
-            can_draw_sigils = False
-    if can_draw_sigils or not (default_format or config["allow_base_game_display"]):
-        can_draw_sigils = True
+        try:
+            bottom_image = get_bottom_template(tier, file_tier, sac, temple)
+            image.paste(bottom_image, (0, image.height - bottom_image.height), bottom_image)
+        except FileNotFoundError:
+            print(f"Error: assets/cardbacks/{file_tier}{temple}{sac}_bt.png image not found.")
+            logging.error(f"Error: assets/cardbacks/{file_tier}{temple}{sac}_bt.png image not found.")
+            raise
 
-        if use_empty_bottom:
-            try:
-                if tier != "Rare":
-                    img_path = f"assets/cardbacks/{file_tier}{sac}Cardback_bt.png"
-                    img = Image.open(img_path).convert("RGBA")
-                    bottom_image = costs.get_temple_variant(img, temple)
-                    bottom_image = bottom_image.resize((bottom_image.width * 10, bottom_image.height * 10), Image.NEAREST)
-                else:
-                    bottom_image = Image.open(f"assets/cardbacks/{file_tier}{temple}{sac}Cardback_bt.png")
-                    bottom_image = bottom_image.resize((bottom_image.width * 10, bottom_image.height * 10), Image.NEAREST)
-                image.paste(bottom_image, (0, image.height - bottom_image.height), bottom_image)
-            except FileNotFoundError:
-                print(f"Error: assets/cardbacks/{file_tier}{temple}{sac}_bt.png image not found.")
-                logging.error(f"Error: assets/cardbacks/{file_tier}{temple}{sac}_bt.png image not found.")
-                return
-
-        if conduit:
-            # We draw the conduit indicator on the image.
-            image = draw_conduit_indicator(image, conduit_img)
-
-        # Draw each sigil on the card
-        for sigil in sigil_list:
-            if sigil == "RAINBOW":
+    if conduit:
+        # We draw the conduit indicator on the image.
+        image = draw_conduit_indicator(image, conduit_img)
+
+    # Draw each sigil on the card
+    for sigil in sigil_list:
+        if sigil == "RAINBOW":
+            sigil_y += 10 - sigil_y % 10
+            sigil_img = get_image("assets/cardbacks/RAINBOW.png", temple)
+            image = paste_sigil(image, sigil_img, (130, sigil_y))
+            sigil_y += 5
+        else:
+            sigil_img = sigil.getImage() if default_format else sigil.getImage(shortened_format=True)
+            if sigil.is_latcher or sigil.is_cell:
+                sigil_img = get_latch_image(sigil_img, temple) if sigil.is_latcher else get_cell_image(sigil_img, temple)
                 sigil_y += 10 - sigil_y % 10
-                rainbow_image = Image.open("assets/cardbacks/RAINBOW.png").convert("RGBA")
-                sigil_img = costs.get_temple_variant(rainbow_image, temple)
-                image = paste_sigil(image, sigil_img, (130, sigil_y))
-                sigil_y += 5
-            else:
-                sigil_img = sigil.getImage() if default_format else sigil.getImage(shortened_format=True)
-                if sigil.is_latcher or sigil.is_cell:
-                    sigil_img = get_latch_image(sigil_img, temple) if sigil.is_latcher else get_cell_image(sigil_img, temple)
-                    sigil_y += 10 - sigil_y % 10
-                    sigil_x = 20 if sigil.is_latcher else 0
-                else:
-                    sigil_x = config['sigil_left_border']
-                image = paste_sigil(image, sigil_img, (sigil_x, sigil_y))
-            sigil_y += sigil_img.height + 5
-
-        if len(trait_list) > 0:
-            try:
-                traitlines = Image.open(f"assets/cardbacks/Traitlines.png")
-                traitline = costs.get_temple_variant(traitlines, temple)
-            except FileNotFoundError:
-                print(f"Error: assets/cardbacks/Traitlines.png image not found.")
-                logging.error(f"Error: assets/cardbacks/Traitlines.png image not found.")
-                return
-            traitline = traitline.resize((traitline.width * 10, traitline.height * 10), Image.NEAREST)
-            traitline_x = (image.width - traitline.width) // 2
-            traitline_x -= traitline_x % 10
-            if config["traits_at_bottom"] and not use_empty_bottom:
-                traitline_y = get_bottom_outline_y(tier, temple, bloodless) - trait_height
-                traitline_y -= (traitline_y % 10)
+                sigil_x = 20 if sigil.is_latcher else 0
             else:
-                traitline_y = sigil_y - (sigil_y % 10) + 10
-            sigil_y = traitline_y + traitline.height + 6
-            image.paste(traitline, (traitline_x, traitline_y), traitline)
+                sigil_x = config['sigil_left_border']
+            image = paste_sigil(image, sigil_img, (sigil_x, sigil_y))
+        sigil_y += sigil_img.height + 5
 
-        for trait in trait_list:
-            trait_img = trait.getImage(color=TEXT_COLORS[temple])
-            image = paste_sigil(image, trait_img, (config['sigil_left_border'], sigil_y))
-            sigil_y += trait_img.height
-            if trait.is_attack_sigil:
-                attack_sigil = trait.sigilImage()
-                attack_box = config["attack_sigil_box"].get(temple if not bloodless else 'Terrain')
+    if len(trait_list) > 0:
+        try:
+            traitline = get_upscaled_image("assets/cardbacks/Traitlines.png", temple)
+        except FileNotFoundError:
+            print(f"Error: assets/cardbacks/Traitlines.png image not found.")
+            logging.error(f"Error: assets/cardbacks/Traitlines.png image not found.")
+            raise
+        traitline_x = (image.width - traitline.width) // 2
+        traitline_x -= traitline_x % 10
+        if config["traits_at_bottom"] and not use_empty_bottom:
+            traitline_y = get_bottom_outline_y(tier, temple, bloodless) - trait_height
+            traitline_y -= (traitline_y % 10)
+        else:
+            traitline_y = sigil_y - (sigil_y % 10) + 10
+        sigil_y = traitline_y + traitline.height + 6
+        image.paste(traitline, (traitline_x, traitline_y), traitline)
 
-                box_x = attack_box[0] + ((attack_box[2] - attack_box[0]) - attack_sigil.width) // 2
-                box_y = attack_box[1] + ((attack_box[3] - attack_box[1]) - attack_sigil.height) // 2
-                image = paste_sigil(image, attack_sigil, (box_x, box_y))
-    return can_draw_sigils, image
+    for trait in trait_list:
+        trait_img = trait.getImage(color=TEXT_COLORS[temple])
+        image = paste_sigil(image, trait_img, (config['sigil_left_border'], sigil_y))
+        sigil_y += trait_img.height
+        if trait.is_attack_sigil:
+            attack_sigil = trait.sigilImage()
+            attack_box = config["attack_sigil_box"].get(temple if not bloodless else 'Terrain')
+
+            box_x = attack_box[0] + ((attack_box[2] - attack_box[0]) - attack_sigil.width) // 2
+            box_y = attack_box[1] + ((attack_box[3] - attack_box[1]) - attack_sigil.height) // 2
+            image = paste_sigil(image, attack_sigil, (box_x, box_y))
+    return image
 
 
 def draw_base_game_display(image, conduit, conduit_img, sigil_list):
@@ -352,39 +441,35 @@ def draw_base_game_display(image, conduit, conduit_img, sigil_list):
 def create_card(csv_dict):
     global TEMPLES, TEXT_COLORS
     # Load data
-    bloodless = ('Bloodless' in csv_dict['Sigils'] or 'Bloodless' in csv_dict['Traits']) and config['bloodless_outline']
-    sac = "Terrain" if bloodless else ""
-    tier = csv_dict['Tier']
-    file_tier = tier if tier != "Side Deck" else "Common"
-    temple = csv_dict['Temple']
-
-    # Load card back
-    img = Image.open(f"assets/cardbacks/{file_tier}{sac}Cardback.png").convert("RGBA")
-    image = costs.get_temple_variant(img, temple)
-    image = image.resize((image.width * 10, image.height * 10), Image.NEAREST)
+    variant = get_card_variant(csv_dict)
+    bloodless, sac = variant["bloodless"], variant["sac"]
+    tier, file_tier, temple = variant["tier"], variant["file_tier"], variant["temple"]
 
     # Load name
     name = csv_dict['Card Name']
-    cost = costs.get_cost(csv_dict['Cost'] if csv_dict['Cost'].upper() not in ['NONE', '', 'FREE'] else None)
-
-    if config["text_over_art"]:
-        paste_card_art(name, image, cost, temple)
+    cost = variant["cost"]
 
-    # Determine the tribe list.
-    tribes = csv_dict['Tribes'].split(' ') if csv_dict['Tribes'] not in ['None', ''] else []
+    # Load card back
+    if config["text_over_art"] and config["native_resolution_compositing"]:
+        # The art goes under everything else, so it can be pasted before upscaling the card
+        image = get_native_card(name, file_tier, sac, temple)
+        paste_costs(image, cost, temple)
+    else:
+        image = get_card_template(file_tier, sac, temple)
+        if config["text_over_art"]:
+            paste_card_art(name, image, cost, temple)
 
-    # Determine if a conduit indicator will need to be on the card because of the ''Conduit'' tribe.
-    conduit = None
+    tribes = variant["tribes"]
+    # A conduit indicator is needed on the card because of the ''Conduit'' tribe.
+    conduit = variant["conduit"]
     conduit_img = None
-    if "Conduit" in tribes and config["conduit_tribe_overlay"]:
-        conduit = "NullConduit"
 
     # Generate sigil and trait list
     sigil_list, trait_list, has_attack_sigil, conduit = get_sigil_and_trait_list(csv_dict, conduit)
 
     # If a conduit indicator is needed, we try to fetch the right one. (Conduit sigils come with their own indicator)
     if conduit:
-        conduit_img = Image.open(f"assets/conduit_indicators/{conduit}.png").convert("RGBA")
+        conduit_img = get_image(f"assets/conduit_indicators/{conduit}.png")
 
     # Write text
     draw_text(image, name, tier, temple, tribes, csv_dict["Flavor Text"])
@@ -396,28 +481,15 @@ def create_card(csv_dict):
     if conduit:
         sigil_y += conduit_img.height
 
-    can_draw_sigils = config["allow_default_formatting"]
-    if can_draw_sigils:
-        # Try to use default format
-
-        can_draw_sigils, image = draw_sigils(
-            image, temple, tier, file_tier, sac, bloodless, conduit,
-            conduit_img, sigil_y, sigil_list, trait_list,
-            True
-        )
-
-    if not can_draw_sigils and config["allow_shorter_formatting"]:
-        # Try to use shorter format
-
-        can_draw_sigils, image = draw_sigils(
+    # Choose the format from the measured heights, so that sigils are only rendered in the format they are drawn in
+    layout = plan_sigil_layout(sigil_list, trait_list, sigil_y, image.height, tier, temple, bloodless)
+    if layout["format"] in ["default", "short"]:
+        image = draw_sigils(
             image, temple, tier, file_tier, sac, bloodless, conduit,
             conduit_img, sigil_y, sigil_list, trait_list,
-            False
+            layout["format"] == "default", layout["use_empty_bottom"], layout["trait_height"]
         )
-
-    if not can_draw_sigils and config["allow_base_game_display"]:
-        # Use base game display
-
+    elif layout["format"] == "base game":
         image = draw_base_game_display(image, conduit, conduit_img, sigil_list)
 
     if not config["text_over_art"]:
@@ -425,13 +497,101 @@ def create_card(csv_dict):
 
     # Print stats
     draw = ImageDraw.Draw(image)
-    heavyweight_font = ImageFont.truetype(FONT, config['stats'])
+    heavyweight_font = get_font(config['stats'])
     health = int(csv_dict['Health'] if csv_dict['Health'] not in ["x", "X", ''] else 0)
-    draw.text(config['health_coord'], str(health), fill="black", font=heavyweight_font)
+    write_text(draw, config['health_coord'], str(health), "black", heavyweight_font)
     if not (has_attack_sigil and
             (config["remove_power_stat_when_attack_sigil_present"] or config["attack_sigil_on_power_stat"])):
         power = int(csv_dict['Power'] if csv_dict['Power'] not in ["x", "X", ''] else 0)
         power_coord = config['power_coord'].get(temple if not bloodless else 'Terrain')
-        draw.text(power_coord, str(power), fill="black", font=heavyweight_font)
+        write_text(draw, power_coord, str(power), "black", heavyweight_font)
 
     return image, name
+
+
+def get_preview_image(image, scale):
+    """
+    Returns the image reduced to a fraction of its size, between 0 and 1. Whole fractions such as 1/4 average each
+    4x4 block of pixels, which is much faster than resampling.
+    """
+    if not 0 < scale <= 1:
+        raise ValueError(f"Preview scale must be between 0 and 1, not {scale}.")
+    factor = 1 / scale
+    if factor == round(factor):
+        return image.reduce(round(factor)) if factor > 1 else image
+    return image.resize((max(round(image.width * scale), 1), max(round(image.height * scale), 1)), Image.BOX)
+
+
+def create_preview(csv_dict, scale=0.25):
+    """
+    Creates the card at full size and reduces it to a fraction of its size. It costs as much as create_card, but the
+    result is smaller to keep, send or encode.
+    """
+    image, name = create_card(csv_dict)
+    return get_preview_image(image, scale), name
+
+
+def check_card(csv_dict):
+    """
+    Runs the parsing, asset loading and layout decisions of create_card without drawing the card.
+    Returns the chosen sigil format (None if it couldn't be decided), whether the sigils overflow the card or use its
+    empty bottom, the missing asset files, the sigils and traits that aren't loaded, and other errors.
+    """
+    report = dict(format=None, overflow=False, empty_bottom=False, missing=[], unknown=[], errors=[])
+
+    def require(load):
+        try:
+            return load()
+        except FileNotFoundError as e:
+            if e.filename not in report["missing"]:
+                report["missing"].append(e.filename)
+
+    variant = get_card_variant(csv_dict)
+    bloodless, sac = variant["bloodless"], variant["sac"]
+    tier, file_tier, temple, cost = variant["tier"], variant["file_tier"], variant["temple"], variant["cost"]
+
+    cardback = require(lambda: get_image(get_cardback_path(file_tier, sac), temple))
+    require(lambda: get_card_art(csv_dict['Card Name']))
+    try:
+        require(lambda: costs.get_cost_images(cost, temple))
+    except ValueError as e:
+        report["errors"].append(str(e))
+
+    for column in ['Sigils', 'Traits']:
+        for sigil in csv_dict[column].split(', ') if csv_dict[column] not in ['None', ''] else []:
+            sigil = sigil.split("_")[1] if "LATCHER" in sigil or "CELL" in sigil else sigil
+            if sigil != "RAINBOW" and sigil not in sigils.SIGILS and sigil not in sigils.TRAITS:
+                report["unknown"].append(sigil)
+
+    parsed = get_sigil_and_trait_list(csv_dict, variant["conduit"])
+    if parsed is None:
+        report["errors"].append("Sigils and traits could not be read.")
+        return report
+    sigil_list, trait_list, _, conduit = parsed
+
+    sigil_y = config['sigil_top_height']
+    if conduit:
+        conduit_img = require(lambda: get_image(f"assets/conduit_indicators/{conduit}.png"))
+        sigil_y += conduit_img.height if conduit_img else 0
+    if "RAINBOW" in sigil_list:
+        require(lambda: get_image("assets/cardbacks/RAINBOW.png", temple))
+    missing_count = len(report["missing"])
+    for sigil in sigil_list + trait_list:
+        if sigil != "RAINBOW":
+            require(lambda: sigil.getHeight(shortened_format=True))
+            if sigil in trait_list and sigil.is_attack_sigil:
+                require(lambda: sigil.sigilImageSize())
+    if cardback is None or len(report["missing"]) > missing_count:
+        # The layout can't be decided without the card's and sigils' sizes
+        return report
+
+    layout = require(lambda: plan_sigil_layout(sigil_list, trait_list, sigil_y, cardback.height * 10, tier, temple,
+                                               bloodless))
+    if layout is not None:
+        report["format"] = layout["format"]
+        report["overflow"] = layout["overflow"]
+        report["empty_bottom"] = layout["use_empty_bottom"]
+        if layout["use_empty_bottom"]:
+            require(lambda: get_bottom_template(tier, file_tier, sac, temple))
+    return report
+
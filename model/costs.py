@@ -1,19 +1,16 @@
+from threading import Lock
+
 from PIL import Image
 from model import config, logging
+from model.assets import get_image, get_temple_variant
 
 
 TEMPLES = config["temples"]
 
-
-def get_temple_variant(image, temple):
-    if temple not in TEMPLES:
-        raise ValueError(f"'{temple}' is not a valid temple.")
-    width, height = image.size
-    version_height = height // len(TEMPLES)
-    version_index = TEMPLES.index(temple)
-    top = version_index * version_height
-    bottom = (version_index + 1) * version_height
-    return image.crop((0, top, width, bottom))
+# Parsed costs and their images are memoized by cost string, decks only using a few dozen distinct costs.
+_costs = dict()
+_cost_images = dict()
+_costs_lock = Lock()
 
 
 class Blood:
@@ -31,9 +28,11 @@ class Blood:
             raise TypeError("Sub operation can only be performed on two resources of the same type")
         return Blood(self.amount - other.amount)
 
+    def getSpriteFiles(self) -> list:
+        return ["assets/costs/blood/blood.png"]
+
     def getCostImage(self, temple: str) -> Image:
-        img = Image.open(f"assets/costs/blood/blood.png").convert("RGBA")
-        cost_img = get_temple_variant(img, temple)
+        cost_img = get_image("assets/costs/blood/blood.png", temple)
 
         total_width = cost_img.width * self.amount
         final_img = Image.new('RGBA', (total_width, cost_img.height))
@@ -59,13 +58,16 @@ class Bones:
             raise TypeError("Sub operation can only be performed on two resources of the same type")
         return Bones(self.amount - other.amount)
 
+    def getSpriteFiles(self) -> list:
+        if self.amount > 4:
+            return [f"assets/costs/bones/bones{self.amount}.png"]
+        return ["assets/costs/bones/bones.png"]
+
     def getCostImage(self, temple: str) -> Image:
         if self.amount > 4:
-            img = Image.open(f"assets/costs/bones/bones{self.amount}.png").convert("RGBA")
-            return get_temple_variant(img, temple)
+            return get_image(f"assets/costs/bones/bones{self.amount}.png", temple)
 
-        img = Image.open("assets/costs/bones/bones.png").convert("RGBA")
-        version_img = get_temple_variant(img, temple)
+        version_img = get_image("assets/costs/bones/bones.png", temple)
 
         duplicate_image = version_img.copy()
         final_width = version_img.width + (duplicate_image.width - 10) * (self.amount - 1)
@@ -95,28 +97,35 @@ class Energy:
             raise TypeError("Sub operation can only be performed on two resources of the same type")
         return Energy(self.current_energy - other.current_energy, self.max_energy - other.max_energy)
 
+    def getSpriteFiles(self) -> list:
+        if self.current_energy > 6:
+            files = [f"assets/costs/energy/energy{self.current_energy}.png"]
+            if self.max_energy > 0:
+                files.append(f"assets/costs/energy/overcharge{self.max_energy}.png")
+            return files
+        return ["assets/costs/energy/energy_bar.png", "assets/costs/energy/overcharge.png",
+                "assets/costs/energy/energy.png"]
+
     def getCostImage(self, temple: str) -> Image:
         if self.current_energy > 6:
-            img = Image.open(f"assets/costs/energy/energy{self.current_energy}.png").convert("RGBA")
-            energy_img = get_temple_variant(img, temple)
+            energy_img = get_image(f"assets/costs/energy/energy{self.current_energy}.png", temple)
             if self.max_energy > 0:
-                img = Image.open(f"assets/costs/energy/overcharge{self.max_energy}.png").convert("RGBA")
-                overcharge_img = get_temple_variant(img, temple)
+                overcharge_img = get_image(f"assets/costs/energy/overcharge{self.max_energy}.png", temple)
                 cost_img = Image.new("RGBA", (energy_img.width + overcharge_img.width, energy_img.height))
                 cost_img.paste(energy_img)
                 cost_img.paste(overcharge_img, (energy_img.width, 0))
             else:
                 cost_img = energy_img
         else:
-            img = Image.open("assets/costs/energy/energy_bar.png").convert("RGBA")
-            cost_img = get_temple_variant(img, temple)
+            img = get_image("assets/costs/energy/energy_bar.png")
+            cost_img = get_image("assets/costs/energy/energy_bar.png", temple).copy()
 
             x_index = img.width - 10 * 4
-            overcharge = Image.open("assets/costs/energy/overcharge.png").convert("RGBA")
+            overcharge = get_image("assets/costs/energy/overcharge.png")
             for _ in range(self.max_energy):
                 cost_img.paste(overcharge, (x_index, 20))
                 x_index -= 40
-            energy = Image.open("assets/costs/energy/energy.png").convert("RGBA")
+            energy = get_image("assets/costs/energy/energy.png")
             for _ in range(self.current_energy - self.max_energy):
                 cost_img.paste(energy, (x_index, 20))
                 x_index -= 40
@@ -146,13 +155,19 @@ class Gems:
         return Gems(*self.gems[:])
 
     @staticmethod
-    def getGemImage(gem, temple) -> Image:
+    def getGemPath(gem) -> str:
         shatter = "shattered_" if "shattered" in gem else ""
         gem = gem.split(" ")[-1].lower()
         color = dict(emeralds="emerald", sapphires="sapphire", rubies="ruby",
                      topazes="topaz", amethysts="amethyst", garnets="garnet", prisms="prism").get(gem, gem)
-        img = Image.open(f"assets/costs/gems/{shatter}{color.lower()}.png").convert("RGBA")
-        return get_temple_variant(img, temple)
+        return f"assets/costs/gems/{shatter}{color.lower()}.png"
+
+    @staticmethod
+    def getGemImage(gem, temple) -> Image:
+        return get_image(Gems.getGemPath(gem), temple)
+
+    def getSpriteFiles(self) -> list:
+        return [self.getGemPath(gem) for gem in self.gems]
 
     def getCostImage(self, temple: str) -> Image:
         gem_images = []
@@ -178,7 +193,7 @@ class Gems:
         return cost_image
 
 
-def get_cost(strcost):
+def parse_cost(strcost):
     cost = []
     if strcost is None:
         return cost
@@ -199,6 +214,7 @@ def get_cost(strcost):
                 while energy is None and i < len(cost):
                     if isinstance(cost[i], Energy):
                         energy = cost[i]
+                    i += 1
 
                 if "energy" in c:  # Current Energy
                     if energy:
@@ -233,3 +249,33 @@ def get_cost(strcost):
     except KeyError as e:
         print(f"Error: {e}")
         logging.error(f"Error: {e}")
+
+
+def get_cost(strcost):
+    """
+    Returns the resources of the cost, or None if it can't be parsed. Each cost string is only parsed once, and its
+    resources are shared by every card using it : they must not be modified.
+    """
+    with _costs_lock:
+        if strcost in _costs:
+            return _costs[strcost]
+    cost = parse_cost(strcost)
+    cost = tuple(cost) if cost is not None else None
+    with _costs_lock:
+        _costs[strcost] = cost
+    return cost
+
+
+def get_cost_images(strcost, temple):
+    """Returns the image of every resource of the cost, composed once per cost string and temple."""
+    key = (strcost, temple)
+    with _costs_lock:
+        if key in _cost_images:
+            return _cost_images[key]
+    cost = get_cost(strcost)
+    if cost is None:
+        raise ValueError(f"Invalid cost: {strcost}")
+    images = tuple(resource.getCostImage(temple) for resource in cost)
+    with _costs_lock:
+        _cost_images[key] = images
+    return images
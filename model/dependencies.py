@@ -0,0 +1,141 @@
+import os
+
+from model import cards, costs, config, sigils
+from model.assets import MANIFEST, get_file_name
+
+
+def get_cost_files(cost):
+    """Returns every sprite of the cost's asset folder, which is named after the cost's class."""
+    folder = f"assets/costs/{type(cost).__name__.lower()}/"
+    return {path for path in MANIFEST.files if path.startswith(folder)}
+
+
+def get_card_dependencies(csv_dict):
+    """
+    Returns what a card row depends on : the sigils, traits, tokens, cost types and conduit indicator it uses, and
+    every asset file that may be read while rendering it (whether it exists or not).
+    Returns None if the row uses sigils or traits that aren't loaded.
+    """
+    variant = cards.get_card_variant(csv_dict)
+    parsed = cards.get_sigil_and_trait_list(csv_dict, variant["conduit"])
+    if parsed is None:
+        return None
+    sigil_list, trait_list, _, conduit = parsed
+
+    files = {cards.get_cardback_path(variant["file_tier"], variant["sac"]),
+             cards.get_bottom_path(variant["tier"], variant["file_tier"], variant["sac"], variant["temple"])}
+
+    image_file = get_file_name(csv_dict['Card Name'])
+    files.add(f"assets/card_art/{image_file}.png")
+    if "_alt" in csv_dict['Card Name']:
+        files.add(f"assets/card_art/{image_file}-alt.png")
+
+    if conduit:
+        files.add(f"assets/conduit_indicators/{conduit}.png")
+    if trait_list:
+        files.add("assets/cardbacks/Traitlines.png")
+    for sigil in sigil_list + trait_list:
+        if sigil == "RAINBOW":
+            files.add("assets/cardbacks/RAINBOW.png")
+            continue
+        files.update(sigil.getAssetPaths())
+        if sigil.is_latcher:
+            files |= {f"assets/cardbacks/LATCH{suffix}.png" for suffix in ["", "3", "4"]}
+        if sigil.is_cell:
+            files |= {f"assets/cardbacks/CELL{suffix}.png" for suffix in ["", "3", "4"]}
+
+    cost = costs.get_cost(variant["cost"]) or []
+    for resource in cost:
+        files |= get_cost_files(resource)
+
+    return dict(
+        sigils=[sigil if sigil == "RAINBOW" else sigil.name for sigil in sigil_list],
+        traits=[trait.name for trait in trait_list],
+        tokens=[str(sigil.token) for sigil in sigil_list + trait_list if sigil != "RAINBOW" and sigil.token],
+        costs=[type(resource).__name__ for resource in cost],
+        conduit=conduit,
+        files=sorted(files),
+    )
+
+
+def get_required_files(export_type, row):
+    """
+    Returns the asset files an item can't be exported without. Unlike the files returned by get_card_dependencies,
+    variants only used when they exist (outlines, alternate art) are left out.
+    """
+    if export_type != "cards":
+        sigil = (sigils.SIGILS if export_type == "sigils" else sigils.TRAITS).get(row['Name'])
+        if sigil is None:
+            return []
+        files = sigil.getIconPaths()
+        if export_type == "sigils":
+            files.append(sigil.getSigilPath())
+        elif config["exported_traitline"] in cards.TEMPLES:
+            files.append("assets/cardbacks/Traitlines.png")
+        return files
+
+    variant = cards.get_card_variant(row)
+    parsed = cards.get_sigil_and_trait_list(row, variant["conduit"])
+    if parsed is None:
+        return []
+    sigil_list, trait_list, _, conduit = parsed
+
+    files = [cards.get_cardback_path(variant["file_tier"], variant["sac"]),
+             MANIFEST.get_card_art_path(row['Card Name'])[0] or f"assets/card_art/{get_file_name(row['Card Name'])}.png"]
+    if conduit:
+        files.append(f"assets/conduit_indicators/{conduit}.png")
+    if trait_list:
+        files.append("assets/cardbacks/Traitlines.png")
+    for sigil in sigil_list + trait_list:
+        if sigil == "RAINBOW":
+            files.append("assets/cardbacks/RAINBOW.png")
+            continue
+        files += sigil.getIconPaths()
+        if not sigil.is_trait or sigil.is_attack_sigil:
+            files.append(sigil.getSigilPath())
+
+    for resource in costs.get_cost(variant["cost"]) or []:
+        files += resource.getSpriteFiles()
+    return files
+
+
+def get_missing_assets(export_type, rows):
+    """Returns the missing asset files needed by the rows, each with the names of the items needing it."""
+    missing = {}
+    for row in rows:
+        for path in MANIFEST.get_missing(get_required_files(export_type, row)):
+            missing.setdefault(path, []).append(row.get('Card Name', row.get('Name', '')))
+    return missing
+
+
+class DependencyIndex:
+    """
+    Maps every sigil, trait, token, cost type, conduit indicator and asset file to the card rows that depend on it.
+    Asset files are indexed by their path (e.g. 'assets/sigils/Airborne.png').
+    """
+
+    def __init__(self, card_rows):
+        self.rows = list(card_rows)
+        self.index = {}
+        for row_id, row in enumerate(self.rows):
+            dependencies = get_card_dependencies(row)
+            if dependencies is None:
+                continue
+            for kind in ["sigils", "traits", "tokens", "costs", "files"]:
+                for dependency in dependencies[kind]:
+                    self.index.setdefault(kind, {}).setdefault(dependency, set()).add(row_id)
+            if dependencies["conduit"]:
+                self.index.setdefault("conduit", {}).setdefault(dependencies["conduit"], set()).add(row_id)
+
+    def get_rows_using(self, dependency):
+        """
+        Returns the rows of the cards depending on a sigil, trait, token, cost type, conduit indicator or asset file,
+        in the order of the CSV file. Names are case-insensitive, and asset files may be given by their file name only.
+        """
+        dependency = dependency.upper()
+        row_ids = set()
+        for kind, names in self.index.items():
+            for name, users in names.items():
+                if name.upper() == dependency or (kind == "files" and os.path.basename(name).upper() == dependency):
+                    row_ids |= users
+        return [self.rows[row_id] for row_id in sorted(row_ids)]
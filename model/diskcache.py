@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image
+from model import logging
+
+
+class DiskCache:
+    """
+    Content-addressed cache of rendered images stored as PNG files, shared between runs and processes.
+    Images are stored under the hash of their key, and the least recently used files are deleted once the folder goes
+    over its byte budget. A budget of 0 disables the cache.
+    """
+
+    def __init__(self, folder: str, byte_budget: int):
+        self.folder = folder
+        self.byte_budget = byte_budget
+        self.__size = None
+        self.__lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.byte_budget > 0
+
+    def get_path(self, key):
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        return os.path.join(self.folder, digest[:2], digest + ".png")
+
+    def get(self, key):
+        """Returns the image stored under the key, or None if there is none."""
+        if not self.enabled:
+            return None
+        path = self.get_path(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+                os.utime(path)
+                return image.convert("RGBA") if image.mode != "RGBA" else image
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Failed to read cached render at {path}: {e}")
+            return None
+
+    def put(self, key, image):
+        if not self.enabled:
+            return
+        path = self.get_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image.save(temp_path, format="PNG")
+            os.replace(temp_path, path)
+        except Exception as e:
+            logging.error(f"Failed to write cached render at {path}: {e}")
+            return
+        with self.__lock:
+            if self.__size is None:
+                self.__size = sum(size for _, _, size in self.__get_files())
+            else:
+                self.__size += os.path.getsize(path)
+            if self.__size > self.byte_budget:
+                self.__evict()
+
+    def __get_files(self):
+        files = []
+        for root, _, file_names in os.walk(self.folder):
+            for file_name in file_names:
+                try:
+                    stat = os.stat(os.path.join(root, file_name))
+                    files.append((stat.st_mtime, os.path.join(root, file_name), stat.st_size))
+                except FileNotFoundError:
+                    pass
+        return files
+
+    def __evict(self):
+        """Deletes the least recently used files until the cache is back under 90% of its budget."""
+        files = sorted(self.__get_files())
+        self.__size = sum(size for _, _, size in files)
+        for _, path, size in files:
+            if self.__size <= self.byte_budget * 0.9:
+                break
+            try:
+                os.remove(path)
+                self.__size -= size
+            except FileNotFoundError:
+                pass
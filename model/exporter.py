@@ -0,0 +1,414 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from csv import DictReader
+from tqdm import tqdm
+from PIL import Image, ImageMath
+from model import cards, sigils, config, logging
+from model.archives import ArchiveWriter
+from model.assets import get_image, get_upscaled_image
+from model.builds import BuildManifest, PixelIndex
+from model.dependencies import get_missing_assets
+
+CARDS_FILE_PATH = config["cards_file_path"]
+SIGILS_FILE_PATH = config["sigils_file_path"]
+TRAITS_FILE_PATH = config["traits_file_path"]
+IMAGE_FORMAT = config["export_image_format"]
+PNG_COMPRESS_LEVEL = config["export_png_compress_level"]
+PNG_PALETTE = config["export_png_palette"]
+SKIP_UNCHANGED = config["export_skip_unchanged"]
+EXTENSION = "." + IMAGE_FORMAT
+PROGRESS_LABEL = "\033[34mExporting\033[0m"
+
+_loaded_files = set()
+# When a worker exports to an archive, its encoded files are collected here instead of being written, and previews
+# are exported at the scale set here
+_encoded = threading.local()
+# (pixel hash, size) of the files already in the output folder by path, when unchanged images aren't written again
+_pixel_index = None
+
+
+def get_csv_data(file_path):
+    try:
+        with open(file_path, 'r', newline='', encoding='UTF-8') as f:
+            return list(DictReader(f, delimiter=','))
+    except Exception as e:
+        logging.error(f"Failed to read CSV file at {file_path}: {e}\n{traceback.format_exc()}")
+        print(f"Error: Failed to read CSV file at {file_path}.")
+        return []
+
+
+def load_data(csv_data, action):
+    rows = csv_data
+    for row in rows:
+        try:
+            action(row)
+        except Exception as e:
+            logging.error(f"Error loading data for row {row}: {e}\n{traceback.format_exc()}")
+            print(f"Error loading data for row {row}: {e}")
+
+
+def load_registries(export_type, csv_path=None):
+    """
+    Loads the sigils and/or traits needed by the export type, unless they were already loaded by this process. When
+    sigils or traits are exported from another CSV file, the ones of that file are loaded as well.
+    """
+    if export_type in ["cards", "sigils"] and SIGILS_FILE_PATH not in _loaded_files:
+        load_data(get_csv_data(SIGILS_FILE_PATH), sigils.add_sigil)
+        _loaded_files.add(SIGILS_FILE_PATH)
+    if export_type in ["cards", "traits"] and TRAITS_FILE_PATH not in _loaded_files:
+        load_data(get_csv_data(TRAITS_FILE_PATH), sigils.add_trait)
+        _loaded_files.add(TRAITS_FILE_PATH)
+    if csv_path and export_type != "cards" and csv_path not in _loaded_files:
+        load_data(get_csv_data(csv_path), sigils.add_sigil if export_type == "sigils" else sigils.add_trait)
+        _loaded_files.add(csv_path)
+
+
+def get_item_name(row):
+    return row.get('Card Name', row.get('Name', ''))
+
+
+def get_export_color():
+    return "black" if config["export_color"] == (0, 0, 0) else config["export_color"]
+
+
+def get_band_indices(bands, colors):
+    """
+    Returns an L image of the index in colors of every pixel, the colors being the distinct (x, y) values of the two
+    bands, or of the only band.
+    """
+    if len(bands) == 1:
+        lut = [0] * 256
+        for i, (x,) in enumerate(colors):
+            lut[x] = i
+        return bands[0].point(lut)
+    lut = [0] * 65536
+    for i, (x, y) in enumerate(colors):
+        lut[x * 256 + y] = i
+    return ImageMath.lambda_eval(lambda args: args["x"] * 256 + args["y"], x=bands[0], y=bands[1]).point(lut, "L")
+
+
+def get_palette_image(img):
+    """Returns the image as a palette image if it has at most 256 colors that all survive the conversion, or as it is."""
+    colors = img.getcolors(256) if img.mode == "RGBA" else None
+    if colors is None:
+        return img
+    colors = [color for _, color in colors]
+    bands = img.split()
+    # Sigils usually have a band whose values are all different, which maps to the palette on its own. Otherwise the
+    # (R, G) and (B, A) pairs are indexed separately, then their pair of indexes
+    band = next((band for band in range(4) if len({color[band] for color in colors}) == len(colors)), None)
+    if band is not None:
+        indices = get_band_indices(bands[band:band + 1], [color[band:band + 1] for color in colors])
+    else:
+        high, low = sorted({color[:2] for color in colors}), sorted({color[2:] for color in colors})
+        high_index, low_index = {pair: i for i, pair in enumerate(high)}, {pair: i for i, pair in enumerate(low)}
+        indices = get_band_indices(
+            (get_band_indices(bands[:2], high), get_band_indices(bands[2:], low)),
+            [(high_index[color[:2]], low_index[color[2:]]) for color in colors])
+    palette_img = Image.frombytes("P", img.size, indices.tobytes())
+    palette_img.putpalette(bytes(channel for color in colors for channel in color), rawmode="RGBA")
+    if palette_img.convert("RGBA").tobytes() != img.tobytes():
+        return img
+    return palette_img
+
+
+def encode_image(img, file, image_format=IMAGE_FORMAT):
+    if image_format == "webp":
+        img.save(file, format="WEBP", lossless=True)
+    elif image_format == "png":
+        img.save(file, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    else:
+        raise ValueError(f"'{image_format}' is not a valid export image format.")
+
+
+def get_pixel_hash(img):
+    """Hashes the raw pixels of the image along with the settings they would be encoded with."""
+    digest = hashlib.blake2b(f"{img.mode} {img.size} {IMAGE_FORMAT} {PNG_COMPRESS_LEVEL} {PNG_PALETTE}".encode(),
+                             digest_size=16)
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def get_unchanged_size(file_path, pixel_hash):
+    """Returns the size of the file already exported at that path if it has the same pixels, or None."""
+    entry = _pixel_index.get(os.path.normpath(file_path))
+    if entry is None or entry[0] != pixel_hash:
+        return None
+    try:
+        return entry[1] if os.path.getsize(file_path) == entry[1] else None
+    except OSError:
+        return None
+
+
+def save_image(img, file_path):
+    """
+    Encodes and writes the image, returning (path, pixel hash, size, time, written) for the file. When exporting to an
+    archive, the encoded file is collected for the archive writer instead.
+    Images whose pixels match the file already exported at that path are skipped, unless the skip is disabled.
+    """
+    start = time.perf_counter()
+    scale = getattr(_encoded, "scale", 1)
+    if scale != 1:
+        img = cards.get_preview_image(img, scale)
+    files = getattr(_encoded, "files", None)
+    pixel_hash = None
+    if _pixel_index is not None and files is None:
+        pixel_hash = get_pixel_hash(img)
+        size = get_unchanged_size(file_path, pixel_hash)
+        if size is not None:
+            return file_path, pixel_hash, size, time.perf_counter() - start, False
+    if IMAGE_FORMAT == "png" and PNG_PALETTE:
+        img = get_palette_image(img)
+    if files is not None:
+        buffer = io.BytesIO()
+        encode_image(img, buffer)
+        files.append((file_path, buffer.getvalue()))
+        return file_path, pixel_hash, buffer.tell(), time.perf_counter() - start, True
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as f:
+        encode_image(img, f)
+        size = f.tell()
+    return file_path, pixel_hash, size, time.perf_counter() - start, True
+
+
+def get_card_path(row, output_dir="exports"):
+    if config["export_sorted_by_folder"]:
+        return f"{output_dir}/cards/{row['Temple']}/{row['Tier']}/{row['Card Name']}{EXTENSION}"
+    return f"{output_dir}/cards/" + row['Card Name'] + EXTENSION
+
+
+def export_card(row, output_dir="exports"):
+    image, _ = cards.create_card(row)
+    return [save_image(image, get_card_path(row, output_dir))]
+
+
+# Sigil variants, with the setting exporting them, their folder and their file name suffix
+SIGIL_VARIANTS = {
+    "normal": ("export_normal_formatting", "sigils", ""),
+    "short": ("export_shorter_formatting", "short sigils", ""),
+    "base game": ("export_base_game_formatting", "base game sigils", ""),
+    "patch": ("export_sigil_patches", "sigil patches", "_patch"),
+    "icon": ("export_sigil_description_icon", "sigil icons", "_icon"),
+    "trait icon": ("export_trait_description_icon", "sigil icons", "_trait-icon"),
+}
+
+
+def get_sigil_variant(sigil, variant, color):
+    """
+    Returns the sigil rendered as one of the SIGIL_VARIANTS. The normal, short and base game variants are shared
+    renders that must not be modified.
+    """
+    if variant == "normal":
+        return sigil.getImage(color=color)
+    if variant == "short":
+        return sigil.getImage(shortened_format=True, color=color)
+    if variant == "base game":
+        return sigil.getImage(base_game=True, color=color)
+    if variant == "patch":
+        sigil_img = sigil.sigilImage(color=color)
+        sigil_patch = get_image("assets/patch.png").copy()
+        sigil_box = tuple((sigil_patch.size[i] - sigil_img.size[i]) // 2 for i in range(2))
+        return cards.paste_sigil(sigil_patch, sigil_img, sigil_box)
+    if variant == "icon":
+        return sigils.get_resized_image(sigil.sigilImage(color=color), config['sigil_description_icon_size'])
+    if variant == "trait icon":
+        return sigils.get_resized_image(sigil.sigilImage(color=color), config['trait_description_icon_size'])
+    raise ValueError(f"'{variant}' is not a valid sigil variant.")
+
+
+def export_sigil(row, output_dir="exports"):
+    sigil = sigils.SIGILS[row['Name']]
+    color = get_export_color()
+    saved = []
+    for variant, (setting, folder, suffix) in SIGIL_VARIANTS.items():
+        if config[setting]:
+            saved.append(save_image(get_sigil_variant(sigil, variant, color),
+                                    f"{output_dir}/{folder}/" + sigil.name + suffix + EXTENSION))
+    return saved
+
+
+def get_trait_image(trait, temple=None, color="black"):
+    """
+    Returns the trait in the given color, or in the text color of the temple under its traitline. Traits without
+    a traitline must not be modified.
+    """
+    traitline = None
+    if temple is not None:
+        if temple in cards.TEMPLES:
+            traitline = get_upscaled_image("assets/cardbacks/Traitlines.png", temple)
+        color = cards.TEXT_COLORS[temple]
+
+    trait_img = trait.getImage(color=color)
+    if not traitline:
+        return trait_img
+    box = (max(trait_img.width, traitline.width), traitline.height + 6 + trait_img.height)
+    final_img = Image.new("RGBA", box, (0, 0, 0, 0))
+    traitline_x = (final_img.width - traitline.width) // 2
+    final_img.paste(traitline, (traitline_x - traitline_x % 10, 0))
+    final_img.paste(trait_img, (0, traitline.height + 6))
+    return final_img
+
+
+def export_trait(row, output_dir="exports"):
+    temple = config["exported_traitline"] if config["exported_traitline"] != "None" else None
+    trait_img = get_trait_image(sigils.TRAITS[row["Name"]], temple, get_export_color())
+    return [save_image(trait_img, f"{output_dir}/traits/" + row["Name"] + EXTENSION)]
+
+
+EXPORT_FUNCTIONS = dict(cards=export_card, sigils=export_sigil, traits=export_trait)
+
+
+def export_shard(export_type, shard, output_dir, to_archive=False, scale=1):
+    """
+    Exports a group of rows, returning a (name, error, saved, files) status record for each of them, where saved lists
+    the (path, pixel hash, size, time, written) of every file saved. When exporting to an archive, files lists the
+    (path, data) of the encoded files instead of writing them. Images are reduced to the scale before being saved.
+    """
+    export_function = EXPORT_FUNCTIONS[export_type]
+    results = []
+    _encoded.scale = scale
+    for row in shard:
+        _encoded.files = [] if to_archive else None
+        try:
+            saved = export_function(row, output_dir)
+            results.append((get_item_name(row), None, saved, _encoded.files or []))
+        except Exception as e:
+            logging.error(f"Error exporting {get_item_name(row)}: {e}\n{traceback.format_exc()}")
+            results.append((get_item_name(row), str(e), [], []))
+        finally:
+            _encoded.files = None
+    return results
+
+
+def init_worker(export_type, pixel_index=None, csv_path=None):
+    """Prepares a rendering process. Forked processes inherit the registries and caches of their parent."""
+    global _pixel_index
+    load_registries(export_type, csv_path)
+    _pixel_index = pixel_index
+
+
+def get_process_context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def export_rows(export_type, rows, backend=None, workers=None, output_dir="exports", incremental=False, archive=None,
+                scale=1, csv_path=None):
+    """
+    Exports the rows with a bounded pool of worker threads or processes, and returns the names of the items that
+    failed to export once every export has finished. Rows are split into shards that are only submitted while there
+    is room in the queue, and images whose pixels didn't change since the last export aren't written again.
+    Sigils and traits read from another CSV file than config.toml's need its csv_path, for processes to load them.
+    """
+    global _pixel_index
+    if archive and incremental:
+        raise ValueError("Incremental exports can't be written to an archive.")
+    if scale != 1 and incremental:
+        raise ValueError("Previews can't be exported incrementally.")
+    if scale != 1:
+        # Previews get their own folder, so that they never replace full exports nor the build manifest of their folder
+        output_dir = f"{output_dir}/previews"
+    build = None
+    fingerprints = {}
+    if incremental and export_type == "cards":
+        build = BuildManifest(output_dir)
+        outdated = build.get_outdated(rows, lambda row: get_card_path(row, output_dir))
+        print(f"{len(rows) - len(outdated)} cards are up to date, {len(outdated)} need to be exported.")
+        rows = [row for row, _ in outdated]
+        fingerprints = {id(row): fingerprint for row, fingerprint in outdated}
+
+    missing = get_missing_assets(export_type, rows)
+    if missing:
+        print("Warning: Some asset files are missing, the items using them will fail to export :")
+        for path, names in sorted(missing.items()):
+            print(f"  {path} (used by {', '.join(names)})")
+
+    pixel_index = PixelIndex(output_dir) if SKIP_UNCHANGED and not archive else None
+    _pixel_index = pixel_index.get_paths() if pixel_index else None
+
+    backend = backend or config["export_backend"]
+    workers = workers or config["export_workers"] or os.cpu_count() or 1
+    if backend == "processes":
+        shard_size = config["export_shard_size"]
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context(),
+                                       initializer=init_worker, initargs=(export_type, _pixel_index, csv_path))
+    elif backend == "threads":
+        shard_size = 1
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        raise ValueError(f"'{backend}' is not a valid export backend.")
+
+    shards = [rows[i:i + shard_size] for i in range(0, len(rows), shard_size)]
+    queue_slots = threading.BoundedSemaphore(workers + config["export_queue_size"])
+    failed = []
+    saved = []
+    failed_lock = threading.Lock()
+    writer = None
+    if archive:
+        os.makedirs(os.path.dirname(archive) or ".", exist_ok=True)
+        writer = ArchiveWriter(archive, config["export_archive_compression"], workers + config["export_queue_size"])
+
+    with tqdm(total=len(rows), desc=PROGRESS_LABEL, leave=True, bar_format="{l_bar}{bar}|",
+              colour="blue") as pbar, executor:
+
+        def on_shard_done(future, shard):
+            try:
+                error = future.exception()
+                if error is not None:
+                    logging.error(f"Error in worker while exporting {len(shard)} rows: {error}")
+                    results = [(get_item_name(row), str(error), [], []) for row in shard]
+                else:
+                    results = future.result()
+                for row, (name, message, row_saved, files) in zip(shard, results):
+                    for path, data in files:
+                        writer.write(os.path.relpath(path, output_dir), data)
+                    with failed_lock:
+                        saved.extend(row_saved)
+                    if pixel_index:
+                        for path, pixel_hash, size, _, _ in row_saved:
+                            pixel_index.record(path, pixel_hash, size)
+                    if message is not None:
+                        print(f"Error: Failed to export {name}: {message}")
+                        with failed_lock:
+                            failed.append(name)
+                    if build:
+                        build.record(get_card_path(row, output_dir),
+                                     fingerprints[id(row)] if message is None else None)
+            except Exception as e:
+                # Errors raised here would be swallowed by the executor, the rows are reported as failed instead
+                logging.error(f"Error while collecting the exports of {len(shard)} rows: {e}\n{traceback.format_exc()}")
+                with failed_lock:
+                    failed.extend(name for name in map(get_item_name, shard) if name not in failed)
+            finally:
+                queue_slots.release()
+                pbar.update(len(shard))
+
+        for shard in shards:
+            queue_slots.acquire()
+            executor.submit(export_shard, export_type, shard, output_dir, writer is not None, scale).add_done_callback(
+                lambda future, done_shard=shard: on_shard_done(future, done_shard))
+
+    _pixel_index = None
+    if build:
+        build.save()
+    if pixel_index:
+        pixel_index.save()
+    if writer:
+        writer.close()
+    written = [(size, seconds) for _, _, size, seconds, was_written in saved if was_written]
+    if written:
+        megabytes = sum(size for size, _ in written) / 1024 / 1024
+        print(f"Wrote {len(written)} {IMAGE_FORMAT.upper()} files ({megabytes:.1f} MB)"
+              f"{' to ' + archive if archive else ''}, encoded in {sum(seconds for _, seconds in written):.1f}s of "
+              f"worker time.")
+    if len(written) < len(saved):
+        print(f"Skipped {len(saved) - len(written)} files whose pixels didn't change.")
+    return failed
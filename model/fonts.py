@@ -0,0 +1,56 @@
+import math
+
+from threading import Lock
+
+from PIL import Image, ImageDraw, ImageFont
+from model import config
+from model.memorycache import MemoryCache
+
+FONT = "data/fonts/" + config['font'] + ".ttf"
+# Rasterized glyph runs and text lengths are memoized by (font, size, text), most descriptions sharing their words.
+TEXT_CACHE_SIZE = config['text_cache_size']
+
+_fonts = dict()
+_fonts_lock = Lock()
+_glyph_runs = MemoryCache(TEXT_CACHE_SIZE)
+_text_lengths = MemoryCache(TEXT_CACHE_SIZE)
+
+
+def get_font(size, path=FONT):
+    """Returns the font at the given size. Each (path, size) is only loaded once per process and shared by every caller."""
+    key = (path, size)
+    font = _fonts.get(key)
+    if font is None:
+        with _fonts_lock:
+            font = _fonts.get(key)
+            if font is None:
+                font = _fonts[key] = ImageFont.truetype(path, size)
+    return font
+
+
+def get_text_length(text, font):
+    """Returns the length of the text like ImageDraw.textlength, measuring each (font, size, text) once."""
+    return _text_lengths.get((font.path, font.size, text), lambda: font.getlength(text))
+
+
+def get_glyph_run(text, font, start):
+    """
+    Returns the rasterized mask of the text and its offset from the drawing position. Glyphs are rasterized
+    differently depending on the fractional part of that position, which is part of the key.
+    """
+    def rasterize():
+        left, top, right, bottom = font.getbbox(text, anchor="la")
+        # The text is drawn past a margin that leaves room for glyphs reaching left of or above the drawing position
+        margin = (1 - min(left, 0), 1 - min(top, 0))
+        mask = Image.new("L", (right + margin[0] + 2, bottom + margin[1] + 2))
+        ImageDraw.Draw(mask).text((margin[0] + start[0], margin[1] + start[1]), text, fill=255, font=font, anchor="la")
+        return mask, (-margin[0], -margin[1])
+
+    return _glyph_runs.get((font.path, font.size, text, start), rasterize)
+
+
+def write_text(draw, xy, text, fill, font):
+    """Draws a line of text like ImageDraw.text, from the cached glyph run of the text whatever its color."""
+    x, y = math.floor(xy[0]), math.floor(xy[1])
+    mask, offset = get_glyph_run(text, font, (xy[0] - x, xy[1] - y))
+    draw.bitmap((x + offset[0], y + offset[1]), mask, fill=fill)
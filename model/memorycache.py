@@ -0,0 +1,37 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class MemoryCache:
+    """
+    Thread-safe memo of computed values, evicting the least recently used ones once their total weight goes over the
+    capacity. Every value weighs 1 unless a weigh function is given.
+    Values are computed outside the lock, and the first one stored is kept if two threads compute the same key at once.
+    """
+
+    def __init__(self, capacity: int, weigh=None):
+        self.capacity = capacity
+        self.size = 0
+        self.__weigh = weigh or (lambda value: 1)
+        self.__values = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key, compute):
+        """Returns the value cached under the given key, calling compute to produce it if it isn't cached."""
+        with self.__lock:
+            value = self.__values.get(key)
+            if value is not None:
+                self.__values.move_to_end(key)
+                return value
+        value = compute()
+        with self.__lock:
+            cached = self.__values.get(key)
+            if cached is not None:
+                self.__values.move_to_end(key)
+                return cached
+            self.__values[key] = value
+            self.size += self.__weigh(value)
+            while self.size > self.capacity:
+                _, evicted = self.__values.popitem(last=False)
+                self.size -= self.__weigh(evicted)
+        return value
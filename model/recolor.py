@@ -0,0 +1,29 @@
+from PIL import Image, ImageColor
+from model import config
+from model.memorycache import MemoryCache
+
+RECOLOR_CACHE_SIZE = config['recolor_cache_size']
+
+_recolored = MemoryCache(RECOLOR_CACHE_SIZE)
+
+
+def add_color(image: Image.Image, color):
+    """Recolors every pixel of an RGBA image in place, keeping its alpha channel."""
+    if type(color) is str:
+        color = ImageColor.getrgb(color)
+    alpha = image.getchannel("A")
+    image.paste((color[0], color[1], color[2], 0), (0, 0, image.width, image.height))
+    image.putalpha(alpha)
+
+
+def get_recolored_image(key, color, load_image) -> Image.Image:
+    """
+    Returns a copy of the image produced by load_image, recolored with the given color.
+    Recolored images are memoized by (key, color), key being whatever identifies the source asset.
+    """
+    def recolor():
+        image = load_image().convert("RGBA")
+        add_color(image, color)
+        return image
+
+    return _recolored.get((key, color), recolor).copy()
@@ -0,0 +1,61 @@
+import io
+
+from model import cards, sigils
+from model.exporter import SIGILS_FILE_PATH, TRAITS_FILE_PATH, SIGIL_VARIANTS, encode_image, get_sigil_variant, \
+    get_trait_image, load_registries
+
+# Values of the columns a card can leave out when rendered through the Renderer
+CARD_DEFAULTS = {"Cost": "None", "Power": "0", "Health": "0", "Sigils": "None", "Token": "None", "Traits": "None",
+                 "Tribes": "None", "Flavor Text": ""}
+
+
+class Renderer:
+    """
+    Renders cards, sigils and traits in memory, for long-lived processes such as bots or web services.
+    The sigils and traits of the files in config.toml are loaded once, and the asset, text and render caches stay warm
+    from one call to the next. Rendering doesn't change any setting or registry, nor write anything to disk : the disk
+    render cache is left out. A Renderer can be used from several threads at once.
+    Every method returns a new image that can be modified freely, or its encoded bytes when given an image format
+    ("png" or "webp").
+    """
+
+    def __init__(self):
+        load_registries("cards")
+
+    @staticmethod
+    def __output(image, image_format):
+        if image_format is None:
+            return image
+        buffer = io.BytesIO()
+        encode_image(image, buffer, image_format)
+        return buffer.getvalue()
+
+    def render_card(self, row: dict, image_format: str = None, scale: float = 1):
+        """
+        Renders a card from a row of the cards file, without modifying it. Only the Card Name, Temple and Tier columns
+        are required. With a scale below 1, a preview of the card is returned at that fraction of its size.
+        """
+        with sigils.memory_only():
+            image, _ = cards.create_card({**CARD_DEFAULTS, **row})
+        return self.__output(cards.get_preview_image(image, scale), image_format)
+
+    def render_sigil(self, name: str, variant: str = "normal", color="black", image_format: str = None):
+        """
+        Renders a sigil as one of the variants it can be exported as : "normal", "short", "base game", "patch", "icon"
+        or "trait icon". The color is 'black' or an (r, g, b) tuple.
+        """
+        if name not in sigils.SIGILS:
+            raise KeyError(f"'{name}' is not a sigil of {SIGILS_FILE_PATH}.")
+        if variant not in SIGIL_VARIANTS:
+            raise ValueError(f"'{variant}' is not a valid sigil variant.")
+        with sigils.memory_only():
+            image = get_sigil_variant(sigils.SIGILS[name], variant, color)
+        return self.__output(image.copy() if image_format is None else image, image_format)
+
+    def render_trait(self, name: str, temple: str = None, color="black", image_format: str = None):
+        """Renders a trait in the color, or in the text color of the temple under its traitline if one is given."""
+        if name not in sigils.TRAITS:
+            raise KeyError(f"'{name}' is not a trait of {TRAITS_FILE_PATH}.")
+        with sigils.memory_only():
+            image = get_trait_image(sigils.TRAITS[name], temple, color)
+        return self.__output(image.copy() if image_format is None else image, image_format)
@@ -0,0 +1,214 @@
+import os
+import struct
+import traceback
+import zlib
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageChops
+from tqdm import tqdm
+from model import cards, config, logging
+from model.assets import get_upscaled_image
+from model.exporter import PNG_COMPRESS_LEVEL, PROGRESS_LABEL
+
+SHEET_COLUMNS = config["export_sheet_columns"]
+SHEET_ROWS = config["export_sheet_rows"]
+SHEET_DOWNSCALE = config["export_sheet_downscale"]
+SHEET_ORDER = config["export_sheet_order"]
+SHEET_GROUPING = config["export_sheet_grouping"]
+TIERS = ["Common", "Uncommon", "Rare", "Side Deck", "Talking"]
+# Number of scanlines filtered and compressed at once
+BAND_HEIGHT = 64
+
+
+class PNGStreamWriter:
+    """
+    Writes an RGBA PNG a few rows at a time, so that the whole image never has to be held in memory.
+    Rows are stored with the Sub filter, as the difference between each pixel and the one on its left.
+    """
+
+    def __init__(self, path: str, width: int, height: int, compress_level: int = 6):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.__compressor = zlib.compressobj(compress_level)
+        self.__file = open(path, 'wb')
+        self.__file.write(b"\x89PNG\r\n\x1a\n")
+        self.__write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+
+    def __write_chunk(self, chunk_type, data):
+        self.__file.write(struct.pack(">I", len(data)) + chunk_type + data)
+        self.__file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    def write_rows(self, img: Image.Image):
+        """Appends the rows of an RGBA image as wide as the PNG."""
+        if img.mode != "RGBA" or img.width != self.width or self.rows_written + img.height > self.height:
+            raise ValueError(f"Can't append a {img.mode} image of size {img.size} to {self.path}.")
+        stride = self.width * 4
+        for top in range(0, img.height, BAND_HEIGHT):
+            band = img.crop((0, top, img.width, min(top + BAND_HEIGHT, img.height)))
+            left = Image.new("RGBA", band.size, (0, 0, 0, 0))
+            left.paste(band.crop((0, 0, band.width - 1, band.height)), (1, 0))
+            filtered = ImageChops.subtract_modulo(band, left).tobytes()
+            data = self.__compressor.compress(
+                b"".join(b"\x01" + filtered[i:i + stride] for i in range(0, len(filtered), stride)))
+            if data:
+                self.__write_chunk(b"IDAT", data)
+        self.rows_written += img.height
+
+    def close(self):
+        """Finishes the PNG, which must have received all of its rows."""
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Only {self.rows_written} of the {self.height} rows of {self.path} were written.")
+            self.__write_chunk(b"IDAT", self.__compressor.flush())
+            self.__write_chunk(b"IEND", b"")
+        finally:
+            self.__file.close()
+
+    def abort(self):
+        """Closes and deletes the unfinished PNG."""
+        self.__file.close()
+        os.remove(self.path)
+
+
+class Sheet:
+    """
+    A grid of cards written as they are added. Only the row of cards being filled is kept in memory, and it is
+    written to the PNG as soon as it is complete. Cards that failed to render leave their cell empty.
+    """
+
+    def __init__(self, path: str, count: int, cell_size: tuple):
+        self.cell_size = cell_size
+        self.__column = 0
+        self.__strip = None
+        rows = -(-count // SHEET_COLUMNS)
+        self.__writer = PNGStreamWriter(path, SHEET_COLUMNS * cell_size[0], rows * cell_size[1], PNG_COMPRESS_LEVEL)
+
+    def add(self, card):
+        if self.__strip is None:
+            self.__strip = Image.new("RGBA", (self.__writer.width, self.cell_size[1]), (0, 0, 0, 0))
+        if card is not None:
+            if SHEET_DOWNSCALE > 1:
+                card = card.reduce(SHEET_DOWNSCALE)
+            if card.size != self.cell_size:
+                card = card.resize(self.cell_size, Image.LANCZOS)
+            self.__strip.paste(card, (self.__column * self.cell_size[0], 0))
+        self.__column += 1
+        if self.__column == SHEET_COLUMNS:
+            self.__flush()
+
+    def __flush(self):
+        self.__writer.write_rows(self.__strip)
+        self.__strip = None
+        self.__column = 0
+
+    def close(self):
+        if self.__strip is not None:
+            self.__flush()
+        self.__writer.close()
+
+    def abort(self):
+        self.__writer.abort()
+
+
+def get_cell_size():
+    width, height = get_upscaled_image("assets/cardbacks/CommonCardback.png", cards.TEMPLES[0]).size
+    return -(-width // SHEET_DOWNSCALE), -(-height // SHEET_DOWNSCALE)
+
+
+def get_group(row):
+    if SHEET_GROUPING == "none":
+        return "Sheet"
+    if SHEET_GROUPING == "temple":
+        return row['Temple']
+    if SHEET_GROUPING == "tier":
+        return row['Tier']
+    if SHEET_GROUPING == "temple and tier":
+        return f"{row['Temple']} {row['Tier']}"
+    raise ValueError(f"'{SHEET_GROUPING}' is not a valid sheet grouping.")
+
+
+def get_order_key(row):
+    if SHEET_ORDER == "name":
+        return row['Card Name'].lower()
+    if SHEET_ORDER == "temple":
+        return cards.TEMPLES.index(row['Temple']) if row['Temple'] in cards.TEMPLES else len(cards.TEMPLES)
+    if SHEET_ORDER == "tier":
+        return TIERS.index(row['Tier']) if row['Tier'] in TIERS else len(TIERS)
+    raise ValueError(f"'{SHEET_ORDER}' is not a valid sheet order.")
+
+
+def get_sheets(rows):
+    """
+    Returns the (name, rows) of every sheet. Rows are sorted in the sheet order and split by group, groups coming in
+    the order of their first card, then each group is split into sheets of at most columns × rows cards.
+    """
+    if SHEET_ORDER != "csv":
+        rows = sorted(rows, key=get_order_key)
+    groups = {}
+    for row in rows:
+        groups.setdefault(get_group(row), []).append(row)
+    size = SHEET_COLUMNS * SHEET_ROWS
+    return [(f"{group} {i // size + 1}", group_rows[i:i + size])
+            for group, group_rows in groups.items() for i in range(0, len(group_rows), size)]
+
+
+def render_card(row):
+    try:
+        return cards.create_card(row)[0], None
+    except Exception as e:
+        logging.error(f"Error exporting {row['Card Name']}: {e}\n{traceback.format_exc()}")
+        return None, str(e)
+
+
+def render_in_order(rows, workers, lookahead):
+    """Renders the rows on worker threads and yields (row, image, error) in order, rendering at most lookahead ahead."""
+    rows = iter(rows)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for row in rows:
+            pending.append((row, executor.submit(render_card, row)))
+            if len(pending) >= lookahead:
+                row, future = pending.popleft()
+                yield row, *future.result()
+        while pending:
+            row, future = pending.popleft()
+            yield row, *future.result()
+
+
+def export_sheets(rows, workers=None, output_dir="exports"):
+    """
+    Renders the cards into sheets of cards in the output folder, and returns the names of the cards that failed.
+    Cards are rendered in order by a bounded pool of threads and added to their sheet as soon as they are ready, so
+    that memory holds one row of cards per sheet instead of the whole deck.
+    """
+    sheets = get_sheets(rows)
+    workers = workers or config["export_workers"] or os.cpu_count() or 1
+    cell_size = get_cell_size()
+    os.makedirs(f"{output_dir}/sheets", exist_ok=True)
+    failed = []
+    rendered = render_in_order([row for _, sheet_rows in sheets for row in sheet_rows], workers,
+                               workers + config["export_queue_size"])
+
+    with tqdm(total=len(rows), desc=PROGRESS_LABEL, leave=True, bar_format="{l_bar}{bar}|",
+              colour="blue") as pbar:
+        for name, sheet_rows in sheets:
+            sheet = Sheet(f"{output_dir}/sheets/{name}.png", len(sheet_rows), cell_size)
+            try:
+                for _ in sheet_rows:
+                    row, card, error = next(rendered)
+                    if error is not None:
+                        print(f"Error: Failed to export {row['Card Name']}: {error}")
+                        failed.append(row['Card Name'])
+                    sheet.add(card)
+                    pbar.update(1)
+            except BaseException:
+                sheet.abort()
+                raise
+            sheet.close()
+
+    if sheets:
+        print(f"Wrote {len(sheets)} sheets of up to {SHEET_COLUMNS}×{SHEET_ROWS} cards in {output_dir}/sheets.")
+    return failed
@@ -1,7 +1,16 @@
+import hashlib
 import os
 
-from PIL import Image, ImageDraw, ImageFont
+from contextlib import contextmanager
+from threading import local
+
+from PIL import Image, ImageDraw
 from model import config
+from model.assets import MANIFEST, get_file_name, get_image
+from model.diskcache import DiskCache
+from model.memorycache import MemoryCache
+from model.fonts import FONT, get_font, get_text_length, write_text
+from model.recolor import get_recolored_image
 
 SIGILS = dict()
 TRAITS = dict()
@@ -12,17 +21,56 @@ SIGIL_DESCRIPTION_SIZE = config['sigil_description']
 TRAIT_DESCRIPTION_SIZE = config['trait_description']
 SIGIL_DESC_ICON_SIZE = config['sigil_description_icon_size']
 TRAIT_DESC_ICON_SIZE = config['trait_description_icon_size']
-FONT = "data/fonts/" + config['font'] + ".ttf"
 SIGIL_SCALE = config["sigil_img_scale"] / 100
 
+# Rendered sigils and traits are memoized in memory, and cached on disk keyed by everything they depend on.
+RENDER_MEMO_SIZE = config['render_memo_size']
+_renders = MemoryCache(RENDER_MEMO_SIZE)
+RENDER_CACHE = DiskCache(config['render_cache_folder'], config['render_cache_size'] * 1024 * 1024)
+# Threads rendering in memory only, for the rendering API, don't use the disk cache
+_memory_only = local()
+RENDER_SETTINGS = [config[key] for key in ['font', 'sigil_space', 'sigil_img_space', 'sigil_img_scale',
+                                           'show_outline_only', 'icons', 'sigil_name', 'sigil_description',
+                                           'sigil_description_icon_size', 'trait_description',
+                                           'trait_description_icon_size']]
+
+
+def get_renderer_sources():
+    """Returns the source files of the renderer, every module of the model package."""
+    folder = os.path.dirname(__file__)
+    return sorted(os.path.join(folder, file) for file in os.listdir(folder) if file.endswith(".py"))
+
+
+def get_renderer_version():
+    """Hashes the font and the renderer's code, so that cached renders are dropped when either of them changes."""
+    digest = hashlib.sha256()
+    for path in [FONT] + get_renderer_sources():
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+RENDERER_VERSION = get_renderer_version()
+
+
+@contextmanager
+def memory_only():
+    """Within this block, the current thread renders sigils and traits without reading or writing the disk cache."""
+    previous = getattr(_memory_only, "enabled", False)
+    _memory_only.enabled = True
+    try:
+        yield
+    finally:
+        _memory_only.enabled = previous
+
 
 def get_colon_image(color, size):
     image = Image.new("RGBA", (SIGIL_DESCRIPTION_SIZE, SIGIL_DESCRIPTION_SIZE), (0, 0, 0, 0))
     draw = ImageDraw.Draw(image)
-    heavyweight_font = ImageFont.truetype(FONT, size)
-    size = draw.textlength(".", font=heavyweight_font)
-    draw.text((0, 0), ".", fill=color, font=heavyweight_font)
-    draw.text((0, -size * 2.5), ".", fill=color, font=heavyweight_font)
+    heavyweight_font = get_font(size)
+    size = get_text_length(".", heavyweight_font)
+    write_text(draw, (0, 0), ".", color, heavyweight_font)
+    write_text(draw, (0, -size * 2.5), ".", color, heavyweight_font)
     return image.crop((0, 0, int(size), SIGIL_DESCRIPTION_SIZE))
 
 
@@ -30,120 +78,179 @@ def get_resized_image(img, height):
     return img.resize((int(img.width * (height / img.height)), height))
 
 
-def write_description(x_offset, y_offset, starting_size, description_words, color, text_img, size_limit):
-    size = starting_size
-    draw = ImageDraw.Draw(text_img)
-    heavyweight_font = ImageFont.truetype(FONT, SIGIL_DESCRIPTION_SIZE)
-
-    def add_new_line():
-        """Helper function to add a new line to the image."""
-        nonlocal y_offset, text_img, draw
-        y_offset += SIGIL_DESCRIPTION_SIZE
-        new_height = text_img.size[1] + SIGIL_DESCRIPTION_SIZE
-        new_img = Image.new("RGBA", (size_limit, new_height), (0, 0, 0, 0))
-        new_img.paste(text_img, (0, 0))
-        text_img = new_img
-        draw = ImageDraw.Draw(text_img)
+def get_icon_path(word):
+    colon_id = word.index(":")
+    icon_type = "sigils" if "sigil" in word else "icons"
+    return f"assets/{icon_type}/{word[colon_id + 1:-1]}.png"
+
+
+def get_icon_width(word, height):
+    """Returns the width the icon of an [icon_type:value] word has once resized to the given height."""
+    icon = get_image(get_icon_path(word))
+    return int(icon.width * (height / icon.height))
+
 
-    def paste_image(image, x_position):
-        """Helper function to paste an image at a specific position."""
-        text_img.paste(image, (int(x_position), y_offset), image)
+def get_colon_width(size):
+    return int(get_text_length(".", get_font(size)))
 
+
+def get_word_widths(word, font, icon_size, colon_size):
+    """
+    Returns the width a description word takes after another word on the same line, and the width it takes when it
+    starts a new line.
+    """
+    if "[" in word:
+        width = get_icon_width(word, icon_size)
+        return width, width
+    if word == ":":
+        width = get_colon_width(colon_size)
+        return width, width
+    return get_text_length(" " + word, font), get_text_length(word, font)
+
+
+def layout_description(x_offset, y_offset, starting_size, description_words, size_limit):
+    """
+    Breaks a sigil description into lines without drawing anything.
+    Returns the position of every word as (word, (x, y)) pairs, where text words that don't start a line get their
+    leading space, and the y offset of the last line.
+    """
+    size = starting_size
+    heavyweight_font = get_font(SIGIL_DESCRIPTION_SIZE)
+    placements = []
     for word in description_words:
+        width, added_width = get_word_widths(word, heavyweight_font, SIGIL_DESC_ICON_SIZE, SIGIL_DESCRIPTION_SIZE)
+        if size + width <= size_limit:
+            placements.append((word if "[" in word or word == ":" else " " + word, (size, y_offset)))
+            size += width
+        else:
+            y_offset += SIGIL_DESCRIPTION_SIZE
+            placements.append((word, (x_offset, y_offset)))
+            size = x_offset + added_width
+    return placements, y_offset
+
+
+def layout_trait(description_words):
+    """
+    Breaks a trait description into centered lines without drawing anything.
+    Returns the position of every word as (word, (x, y)) pairs, where text words get a leading space unless they
+    start a line after the first one, and the number of lines.
+    """
+    size_limit = config['sigil_space'] - 10
+    heavyweight_font = get_font(TRAIT_DESCRIPTION_SIZE)
+    lines = [[]]
+    lengths = [0]
+    for word in description_words:
+        width, added_width = get_word_widths(word, heavyweight_font, TRAIT_DESC_ICON_SIZE, TRAIT_DESCRIPTION_SIZE)
+        if lengths[-1] + width > size_limit:
+            lengths.append(added_width)
+            lines.append([word])
+        else:
+            lengths[-1] += width
+            lines[-1].append(word)
+
+    placements = []
+    for line_id, (line, length) in enumerate(zip(lines, lengths)):
+        x_offset = (size_limit - length) // 2
+        y_offset = line_id * TRAIT_DESCRIPTION_SIZE
+        for word_id, word in enumerate(line):
+            if "[" in word:
+                width = get_icon_width(word, TRAIT_DESC_ICON_SIZE)
+            elif word == ":":
+                width = get_colon_width(TRAIT_DESCRIPTION_SIZE)
+            else:
+                word = word if line_id > 0 and word_id == 0 else " " + word
+                width = get_text_length(word, heavyweight_font)
+            placements.append((word, (x_offset, y_offset)))
+            x_offset += width
+    return placements, len(lines)
+
+
+def write_description(text_img, placements, color, icon_size, font_size, recolor_icons=False):
+    """Draws laid out description words on the image. Icons and colons stay black unless recolor_icons is set."""
+    draw = ImageDraw.Draw(text_img)
+    heavyweight_font = get_font(font_size)
+    for word, (x, y) in placements:
         # Handling words with embedded icons
         if "[" in word:
-            colon_id = word.index(":")
-            icon_type = "sigils" if "sigil" in word else "icons"
-            icon_path = f"assets/{icon_type}/{word[colon_id + 1:-1]}.png"
-            icon = get_resized_image(Image.open(icon_path), SIGIL_DESC_ICON_SIZE)
-
-            if size + icon.width <= size_limit:
-                paste_image(icon, size)
-                size += icon.width
+            icon_path = get_icon_path(word)
+            if recolor_icons and color != 'black':
+                icon = get_recolored_image((icon_path, icon_size), color,
+                                           lambda: get_resized_image(get_image(icon_path), icon_size))
             else:
-                add_new_line()
-                paste_image(icon, x_offset)
-                size = x_offset + icon.width
+                icon = get_resized_image(get_image(icon_path), icon_size)
+            text_img.paste(icon, (int(x), y), icon)
 
         # Handling colon character
         elif word == ":":
-            colon = get_colon_image('black', SIGIL_DESCRIPTION_SIZE)
-            if size + colon.width <= size_limit:
-                paste_image(colon, size)
-                size += colon.width
+            if recolor_icons and color != 'black':
+                colon = get_recolored_image(("colon", font_size), color, lambda: get_colon_image('black', font_size))
             else:
-                add_new_line()
-                paste_image(colon, x_offset)
-                size = x_offset + colon.width
+                colon = get_colon_image('black', font_size)
+            text_img.paste(colon, (int(x), y), colon)
 
         # Handling text words
         else:
-            space_word_length = draw.textlength(" " + word, font=heavyweight_font)
-            if size + space_word_length <= size_limit:
-                draw.text((size, y_offset), " " + word, fill=color, font=heavyweight_font)
-                size += space_word_length
-            else:
-                add_new_line()
-                draw.text((x_offset, y_offset), word, fill=color, font=heavyweight_font)
-                size = x_offset + draw.textlength(word, font=heavyweight_font)
-
-    return y_offset, text_img
-
-
-def add_color(image: Image.Image, color):
-    for x in range(image.width):
-        for y in range(image.height):
-            pixel_color = (color[0], color[1], color[2], image.getpixel((x, y))[3])
-            image.putpixel((x, y), pixel_color)
+            write_text(draw, (x, y), word, color, heavyweight_font)
 
 
 class Sigil:
 
     def __init__(self, name: str, description: str,
-                 is_attack_sigil: bool = False, image: Image = None, short_image: Image = None,
-                 base_game_image: Image = None, is_trait: bool = False, can_be_colored: bool = True):
+                 is_attack_sigil: bool = False, is_trait: bool = False, can_be_colored: bool = True):
         self.name = name
         self.description = description
         self.needs_token = "TOKEN" in description
         self.token = None
         self.is_trait = is_trait
         self.can_be_colored = can_be_colored
-        self.image = image
-        self.short_image = short_image
-        self.base_game_image = base_game_image
         self.is_attack_sigil = is_attack_sigil
 
     def copy(self):
-        return Sigil(self.name, self.description, self.is_attack_sigil, self.image, self.short_image, self.base_game_image, self.is_trait, self.can_be_colored)
+        return Sigil(self.name, self.description, self.is_attack_sigil, self.is_trait, self.can_be_colored)
 
     def setToken(self, token: object):
         self.token = token
-        self.image = None
-        self.short_image = None
 
     def get_description(self):
         return self.description.replace("TOKEN", str(self.token)) if self.token else self.description
 
+    def getSigilPath(self, color='black'):
+        """Returns the path of the sigil's image, which is its outline when it can't be colored, if there is one."""
+        return MANIFEST.get_sigil_path(self.name,
+                                       config["show_outline_only"] or (color != "black" and not self.can_be_colored))
+
+    def getIconPaths(self):
+        """Returns the paths of the icons drawn in the description, only counting the enabled icon types."""
+        return [get_icon_path(word) for word in self.__get_description_words() if "[" in word]
+
+    def getAssetPaths(self):
+        """Returns every file the sigil may read, whether it exists or not : its icons, its image and its outline."""
+        name = get_file_name(self.name)
+        return sorted(set(self.getIconPaths()) | {f"assets/sigils/{name}.png", f"assets/sigils/{name}_outline.png"})
+
+    def sigilImageSize(self, color='black'):
+        """Returns the size of sigilImage(color), without resizing or coloring anything."""
+        img = get_image(self.getSigilPath(color))
+        return round(img.width * SIGIL_SCALE), round(img.height * SIGIL_SCALE)
+
     def sigilImage(self, color='black'):
-        name = self.name.translate(str.maketrans("", "", " ',-!?"))
-        path = f"assets/sigils/{name}.png"
-        if config["show_outline_only"] or (color != "black" and not self.can_be_colored):
-            new_path = f"assets/sigils/{name}_outline.png"
-            if os.path.exists(new_path):
-                path = new_path
-        sigil_img = Image.open(path).convert("RGBA")
-        sigil_img = sigil_img.resize((round(sigil_img.width * SIGIL_SCALE), round(sigil_img.height * SIGIL_SCALE)))
+        path = self.getSigilPath(color)
+
+        def load_sigil():
+            img = get_image(path)
+            return img.resize((round(img.width * SIGIL_SCALE), round(img.height * SIGIL_SCALE)))
+
         if color != 'black':
-            add_color(sigil_img, color)
-        return sigil_img
+            return get_recolored_image((path, SIGIL_SCALE), color, load_sigil)
+        return load_sigil()
 
     def __draw_base_game(self, sigil_img, color):
-        heavyweight_font = ImageFont.truetype(FONT, SIGIL_NAME_SIZE)
+        heavyweight_font = get_font(SIGIL_NAME_SIZE)
         text_img = Image.new("RGBA", (SIGIL_DESC_SPACE, SIGIL_NAME_SIZE), (0, 0, 0, 0))
         draw = ImageDraw.Draw(text_img)
-        draw.text((0, 0), self.name, fill=color, font=heavyweight_font)
+        write_text(draw, (0, 0), self.name, color, heavyweight_font)
 
-        text_img = text_img.crop((0, 0, round(draw.textlength(self.name, font=heavyweight_font)), SIGIL_NAME_SIZE))
+        text_img = text_img.crop((0, 0, round(get_text_length(self.name, heavyweight_font)), SIGIL_NAME_SIZE))
         final_img_width = max(sigil_img.width, text_img.width)
         final_img_height = sigil_img.height + text_img.height + 5
         final_img = Image.new("RGBA", (final_img_width, final_img_height), (0, 0, 0, 0))
@@ -178,165 +285,115 @@ class Sigil:
 
     @staticmethod
     def __get_trait_image(color, description_words):
-        size_limit = config['sigil_space'] - 10
-        text_img = Image.new("RGBA", (size_limit, TRAIT_DESCRIPTION_SIZE), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(text_img)
-        lengths = [0]
-        words_per_phrase = [0]
-        heavyweight_font = ImageFont.truetype(FONT, TRAIT_DESCRIPTION_SIZE)
-
-        # Calculate x_offset for each step
-        def add_width(width, added_width=None):
-            if lengths[-1] + width > size_limit:
-                lengths.append(width if added_width is None else added_width)
-                words_per_phrase.append(1)
-            else:
-                lengths[-1] += width
-                words_per_phrase[-1] += 1
-
-        for word in description_words:
-            if "[" in word:
-                colon_id = word.index(":")
-                icon_type = "sigils" if "sigil" in word else "icons"
-                icon_path = f"assets/{icon_type}/{word[colon_id + 1:-1]}.png"
-                icon = get_resized_image(Image.open(icon_path), TRAIT_DESC_ICON_SIZE)
-                add_width(icon.width)
-            elif word == ":":
-                colon = get_colon_image('black', TRAIT_DESCRIPTION_SIZE)
-                add_width(colon.width)
-            else:
-                add_width(draw.textlength(" " + word, font=heavyweight_font),
-                          draw.textlength(word, font=heavyweight_font))
-
-        # Write the trait
-        x_offset = (text_img.width - lengths[0]) // 2
-        y_offset = 0
-        word_id = 0
-
-        def add_new_line():
-            nonlocal y_offset, text_img
-            y_offset += TRAIT_DESCRIPTION_SIZE
-            new_height = text_img.size[1] + TRAIT_DESCRIPTION_SIZE
-            new_img = Image.new("RGBA", (size_limit, new_height), (0, 0, 0, 0))
-            new_img.paste(text_img, (0, 0))
-            text_img = new_img
-
-        def add_image(img):
-            nonlocal word_id, x_offset, y_offset, text_img
-            if word_id >= words_per_phrase[0]:
-                add_new_line()
-                words_per_phrase.pop(0)
-                lengths.pop(0)
-                x_offset = (text_img.width - lengths[0]) // 2
-                word_id = 0
-            text_img.paste(img, (int(x_offset), y_offset), img)
-            x_offset += img.width
-
-        for word in description_words:
-            if "[" in word:
-                colon_id = word.index(":")
-                icon_type = "sigils" if "sigil" in word else "icons"
-                icon_path = f"assets/{icon_type}/{word[colon_id + 1:-1]}.png"
-                icon = get_resized_image(Image.open(icon_path), TRAIT_DESC_ICON_SIZE)
-                if color != 'black':
-                    add_color(icon, color)
-                add_image(icon)
-            elif word == ":":
-                colon = get_colon_image('black', TRAIT_DESCRIPTION_SIZE)
-                if color != 'black':
-                    add_color(colon, color)
-                add_image(colon)
-            elif word_id < words_per_phrase[0]:
-                draw.text((x_offset, y_offset), " " + word, fill=color, font=heavyweight_font)
-                x_offset += draw.textlength(" " + word, font=heavyweight_font)
-            else:
-                words_per_phrase.pop(0)
-                lengths.pop(0)
-                x_offset = (text_img.width - lengths[0]) // 2
-                word_id = 0
-
-                add_new_line()
-
-                draw = ImageDraw.Draw(text_img)
-                draw.text((x_offset, y_offset), word, fill=color, font=heavyweight_font)
-                x_offset += draw.textlength(word, font=heavyweight_font)
-            word_id += 1
+        placements, line_count = layout_trait(description_words)
+        text_img = Image.new("RGBA", (config['sigil_space'] - 10, TRAIT_DESCRIPTION_SIZE * line_count), (0, 0, 0, 0))
+        write_description(text_img, placements, color, TRAIT_DESC_ICON_SIZE, TRAIT_DESCRIPTION_SIZE, recolor_icons=True)
         return text_img
 
-    def getImage(self, color='black', base_game: bool = False, shortened_format: bool = False):
-        if base_game and self.base_game_image:
-            return self.base_game_image
-        if shortened_format and self.short_image:
-            return self.short_image
-        if not base_game and not shortened_format and self.image:
-            return self.image
+    def __get_render_format(self, base_game, shortened_format):
+        if base_game:
+            return "base game"
+        if self.is_trait:
+            return "trait"
+        return "short" if shortened_format else "default"
+
+    def __get_render_key(self, color, base_game, shortened_format):
+        """Returns everything the rendered image depends on, used as its key in the render cache."""
+        render_format = self.__get_render_format(base_game, shortened_format)
+        files = {}
+        for path in self.getAssetPaths():
+            try:
+                stat = os.stat(path)
+                files[path] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                pass
+        return [RENDERER_VERSION, RENDER_SETTINGS, self.name, self.get_description(), render_format, color,
+                self.is_trait, self.can_be_colored, files]
+
+    def __layout_text(self, description_words, shortened_format):
+        """Lays out the description written after the sigil's name, returning the word placements and text height."""
+        if shortened_format:
+            size = round(get_text_length(self.name, get_font(SIGIL_NAME_SIZE)))
+            size += get_colon_width(SIGIL_NAME_SIZE)
+            placements, y_offset = layout_description(0, SIGIL_NAME_SIZE - SIGIL_DESCRIPTION_SIZE - 1,
+                                                      size, description_words, SIGIL_DESC_SPACE)
+            return placements, y_offset + SIGIL_DESCRIPTION_SIZE
+
+        placements = []
+        size = SIGIL_DESCRIPTION_SIZE
+        # We have to draw the first word because for some reason otherwise the first line is offset from the others.
+        if not ("[" in description_words[0]):
+            first_word = description_words[0]
+            description_words = description_words[1:]
+            placements.append((first_word, (size, SIGIL_NAME_SIZE)))
+            size += get_text_length(first_word, get_font(SIGIL_DESCRIPTION_SIZE))
+        line_placements, y_offset = layout_description(SIGIL_DESCRIPTION_SIZE, SIGIL_NAME_SIZE,
+                                                       size, description_words, SIGIL_DESC_SPACE)
+        return placements + line_placements, y_offset + SIGIL_DESCRIPTION_SIZE
+
+    def getHeight(self, color='black', shortened_format: bool = False):
+        """
+        Returns the height getImage would return for the default or shortened format, measuring the text layout
+        without rendering anything.
+        """
+        description_words = self.__get_description_words()
+        if self.is_trait:
+            return TRAIT_DESCRIPTION_SIZE * layout_trait(description_words)[1]
+        _, text_height = self.__layout_text(description_words, shortened_format)
+        return max(text_height, self.sigilImageSize(color)[1])
 
+    def getImage(self, color='black', base_game: bool = False, shortened_format: bool = False):
+        """
+        Returns the sigil or trait rendered in the given format and color. Renders are memoized in memory by
+        (format, color, token) and shared by every copy of the sigil : they must not be modified.
+        """
+        def render():
+            if getattr(_memory_only, "enabled", False):
+                return self.__render(color, base_game, shortened_format)
+            render_key = self.__get_render_key(color, base_game, shortened_format)
+            image = RENDER_CACHE.get(render_key)
+            if image is None:
+                image = self.__render(color, base_game, shortened_format)
+                RENDER_CACHE.put(render_key, image)
+            return image
+
+        memo_key = (self.name, self.is_trait, self.__get_render_format(base_game, shortened_format), color, self.token)
+        return _renders.get(memo_key, render)
+
+    def __render(self, color, base_game, shortened_format):
         if not self.is_trait:
             sigil_img = self.sigilImage(color)
 
         if base_game:
             if self.is_trait:
-                self.base_game_image = Image.new("RGBA", (0, 0))
-            else:
-                # Draw sigil using base game aesthetic
-                self.base_game_image = self.__draw_base_game(sigil_img, color)
-            return self.base_game_image
+                return Image.new("RGBA", (0, 0))
+            # Draw sigil using base game aesthetic
+            return self.__draw_base_game(sigil_img, color)
 
         description_words = self.__get_description_words()
 
         if self.is_trait:
-            self.image = self.__get_trait_image(color, description_words)
-            self.base_game_image = self.image
-            return self.image
+            return self.__get_trait_image(color, description_words)
 
-        heavyweight_font = ImageFont.truetype(FONT, SIGIL_NAME_SIZE)
-        text_img = Image.new("RGBA", (SIGIL_DESC_SPACE, SIGIL_NAME_SIZE), (0, 0, 0, 0))
+        # Lay the text out first, so that its image is allocated once at its final size
+        placements, text_height = self.__layout_text(description_words, shortened_format)
+        text_img = Image.new("RGBA", (SIGIL_DESC_SPACE, text_height), (0, 0, 0, 0))
+        heavyweight_font = get_font(SIGIL_NAME_SIZE)
         draw = ImageDraw.Draw(text_img)
-        size = round(draw.textlength(self.name, font=heavyweight_font))
-        draw.text((0, 0), self.name, fill=color, font=heavyweight_font)
+        write_text(draw, (0, 0), self.name, color, heavyweight_font)
         if shortened_format:
             # Draw sigil using shortened formatting
-
             colon = get_colon_image(color, SIGIL_NAME_SIZE)
-            text_img.paste(colon, (size, 0), colon)
-            size += colon.width
+            text_img.paste(colon, (round(get_text_length(self.name, heavyweight_font)), 0), colon)
+        write_description(text_img, placements, color, SIGIL_DESC_ICON_SIZE, SIGIL_DESCRIPTION_SIZE)
 
-            y_offset, text_img = write_description(0, SIGIL_NAME_SIZE - SIGIL_DESCRIPTION_SIZE - 1,
-                                                   size, description_words, color,
-                                                   text_img, SIGIL_DESC_SPACE)
-        else:
-            # Draw sigil normally
-
-            new_height = text_img.size[1] + SIGIL_NAME_SIZE
-            new_img = Image.new("RGBA", (SIGIL_DESC_SPACE, new_height), (0, 0, 0, 0))
-            new_img.paste(text_img, (0, 0))
-            text_img = new_img
-            draw = ImageDraw.Draw(text_img)
-            heavyweight_font = ImageFont.truetype(FONT, SIGIL_DESCRIPTION_SIZE)
-            size = SIGIL_DESCRIPTION_SIZE
-
-            # We have to draw the first word because for some reason otherwise the first line is offset from the others.
-            if not ("[" in description_words[0]):
-                first_word = description_words.pop(0)
-                draw.text((size, SIGIL_NAME_SIZE), first_word, fill=color, font=heavyweight_font)
-                size += draw.textlength(first_word, font=heavyweight_font)
-
-            y_offset, text_img = write_description(SIGIL_DESCRIPTION_SIZE, SIGIL_NAME_SIZE,
-                                                   size, description_words, color,
-                                                   text_img, SIGIL_DESC_SPACE)
-
-        text_height = y_offset + SIGIL_DESCRIPTION_SIZE
         final_img_height = max(text_height, sigil_img.height)
         final_img = Image.new("RGBA", (config['sigil_space'], final_img_height), (0, 0, 0, 0))
         final_img.paste(sigil_img,
                         ((SIGIL_IMG_SPACE - sigil_img.width) // 2,
                          min((final_img_height - sigil_img.height) // 2, 10)))
-        final_img.paste(text_img.crop((0, 0, text_img.width, text_height)),
+        final_img.paste(text_img,
                         (SIGIL_IMG_SPACE, (final_img_height - text_height) // 2))
-        if shortened_format:
-            self.short_image = final_img
-        else:
-            self.image = final_img
         return final_img
 
 